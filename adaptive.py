@@ -0,0 +1,127 @@
+import time
+
+DEFAULT_SIZES = (320, 416, 512, 640)
+
+
+class AdaptiveResolution:
+    """
+    Ajusta a resolução de inferência (e o passo entre frames) a uma meta de FPS
+
+    Mantém uma média móvel exponencial do custo por frame (latência da
+    inferência dividida pelo passo) e compara com o orçamento `1/target_fps`.
+    Acima de `high_watermark` do orçamento reduz o imgsz e, já no mínimo,
+    aumenta o passo; abaixo de `low_watermark` desfaz na ordem inversa
+    (primeiro o passo, depois a resolução). Depois de cada ajuste espera
+    `cooldown` inferências para a média refletir a nova configuração.
+
+    Só faz sentido com modelos que aceitam entrada dinâmica (PyTorch ou ONNX
+    exportado com `dynamic=True`); artefatos OpenVINO têm imgsz fixo.
+
+    Args:
+        target_fps (float): Frames por segundo que o loop precisa acompanhar
+        sizes (tuple): Resoluções permitidas (múltiplos de 32), em ordem crescente
+        max_stride (int): Passo máximo (1 = infere todos os frames)
+        high_watermark (float): Fração do orçamento acima da qual degrada
+        low_watermark (float): Fração do orçamento abaixo da qual melhora
+        smoothing (float): Peso de cada nova amostra na média móvel
+        cooldown (int): Inferências entre ajustes
+    """
+
+    def __init__(self, target_fps, sizes=DEFAULT_SIZES, max_stride=3, high_watermark=1.0,
+                 low_watermark=0.6, smoothing=0.2, cooldown=10):
+        if not 0 < low_watermark < high_watermark:
+            raise ValueError("É preciso 0 < low_watermark < high_watermark")
+        self.budget_ms = 1000.0 / target_fps
+        self.sizes = tuple(sorted(sizes))
+        self.max_stride = max(1, max_stride)
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        self.level = len(self.sizes) - 1
+        self.stride = 1
+        self.cost_ms = None
+        self.changes = 0
+        self._since_change = 0
+
+    @property
+    def imgsz(self):
+        return self.sizes[self.level]
+
+    def observe(self, latency_ms):
+        """
+        Registra a latência de uma inferência e ajusta a configuração se preciso
+
+        Returns:
+            bool: True se imgsz ou passo mudaram
+        """
+        cost = latency_ms / self.stride
+        self.cost_ms = cost if self.cost_ms is None else \
+            self.smoothing * cost + (1 - self.smoothing) * self.cost_ms
+        self._since_change += 1
+        if self._since_change < self.cooldown:
+            return False
+
+        load = self.cost_ms / self.budget_ms
+        if load > self.high_watermark:
+            if self.level > 0:
+                self.level -= 1
+            elif self.stride < self.max_stride:
+                self.stride += 1
+            else:
+                return False
+        elif load < self.low_watermark:
+            if self.stride > 1:
+                self.stride -= 1
+            elif self.level < len(self.sizes) - 1:
+                self.level += 1
+            else:
+                return False
+        else:
+            return False
+
+        self.changes += 1
+        self._since_change = 0
+        # A média recomeça na escala da nova configuração
+        self.cost_ms = None
+        return True
+
+    def state(self):
+        return {
+            'imgsz': self.imgsz,
+            'passo': self.stride,
+            'custo_ms': round(self.cost_ms, 2) if self.cost_ms is not None else None,
+            'orcamento_ms': round(self.budget_ms, 2),
+            'ajustes': self.changes,
+        }
+
+
+class AdaptiveDetector:
+    """
+    Envolve uma função (frame, imgsz) -> detecções com o controle adaptativo
+
+    Nos frames pulados pelo passo devolve as detecções da última inferência.
+    As caixas continuam nas coordenadas do frame original: o ultralytics
+    redimensiona a entrada e desfaz a escala no pós-processamento.
+
+    Args:
+        detect_fn (callable): Função (frame, imgsz) -> detecções
+        controller (AdaptiveResolution): Controlador de resolução e passo
+    """
+
+    def __init__(self, detect_fn, controller):
+        self.detect_fn = detect_fn
+        self.controller = controller
+        self.last_detections = None
+        self.skipped = 0
+        self._frame_index = 0
+
+    def __call__(self, frame):
+        self._frame_index += 1
+        if self.last_detections is not None and self._frame_index % self.controller.stride:
+            self.skipped += 1
+            return self.last_detections
+        started = time.perf_counter()
+        self.last_detections = self.detect_fn(frame, self.controller.imgsz)
+        self.controller.observe((time.perf_counter() - started) * 1000)
+        return self.last_detections
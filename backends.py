@@ -0,0 +1,170 @@
+import argparse
+import os
+import shutil
+import time
+
+import cv2
+import numpy as np
+
+MODELS_DIR = 'modelos'
+BACKENDS = ('torch', 'onnx', 'openvino')
+DEFAULT_IMGSZ = 640
+
+
+def exported_model_path(model_name, backend, int8=False, imgsz=DEFAULT_IMGSZ):
+    """Caminho do artefato exportado em cache para a combinação pedida"""
+    stem = os.path.splitext(os.path.basename(model_name))[0]
+    suffix = '_int8' if int8 else ''
+    if backend == 'onnx':
+        return os.path.join(MODELS_DIR, f"{stem}_{imgsz}{suffix}.onnx")
+    return os.path.join(MODELS_DIR, f"{stem}_{imgsz}{suffix}_openvino_model")
+
+
+def _calibration_images(calibration_dir):
+    extensions = ('.jpg', '.jpeg', '.png', '.bmp')
+    return sorted(os.path.join(calibration_dir, name) for name in os.listdir(calibration_dir)
+                  if name.lower().endswith(extensions))
+
+
+def _letterbox(image, imgsz):
+    height, width = image.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    resized = cv2.resize(image, (int(round(width * scale)), int(round(height * scale))))
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - resized.shape[0]) // 2
+    left = (imgsz - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return canvas
+
+
+def _write_calibration_yaml(calibration_dir, names):
+    """Monta um dataset mínimo no formato do ultralytics com os nossos frames"""
+    path = os.path.join(MODELS_DIR, 'calibracao.yaml')
+    with open(path, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(f"path: {os.path.abspath(calibration_dir)}\n")
+        arquivo.write("train: .\nval: .\nnames:\n")
+        for class_id, name in names.items():
+            arquivo.write(f"  {class_id}: {name}\n")
+    return path
+
+
+def _quantize_onnx(float_path, int8_path, calibration_dir, imgsz):
+    from onnxruntime.quantization import CalibrationDataReader, QuantType, quantize_static
+    import onnxruntime as ort
+
+    input_name = ort.InferenceSession(float_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.images = iter(_calibration_images(calibration_dir))
+
+        def get_next(self):
+            path = next(self.images, None)
+            if path is None:
+                return None
+            image = _letterbox(cv2.imread(path), imgsz)
+            blob = cv2.cvtColor(image, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)[None]
+            return {input_name: blob.astype(np.float32) / 255.0}
+
+    quantize_static(float_path, int8_path, FrameReader(), weight_type=QuantType.QInt8)
+
+
+def export_model(model_name, backend, int8=False, calibration_dir=None, imgsz=DEFAULT_IMGSZ):
+    """
+    Exporta o modelo para ONNX ou OpenVINO IR e guarda o resultado em cache
+
+    Args:
+        model_name (str): Pesos do ultralytics (ex.: 'yolov8n.pt')
+        backend (str): 'onnx' ou 'openvino'
+        int8 (bool): Quantização estática INT8 calibrada com `calibration_dir`
+        calibration_dir (str): Pasta com frames das nossas câmeras
+        imgsz (int): Resolução de entrada fixada na exportação
+
+    Returns:
+        str: Caminho do artefato exportado
+    """
+    if backend not in ('onnx', 'openvino'):
+        raise ValueError(f"Backend de exportação inválido: {backend}")
+    target = exported_model_path(model_name, backend, int8, imgsz)
+    if os.path.exists(target):
+        return target
+    if int8 and not (calibration_dir and _calibration_images(calibration_dir)):
+        raise ValueError("Quantização INT8 exige uma pasta de calibração com frames")
+
+    from ultralytics import YOLO
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    model = YOLO(model_name)
+    if backend == 'onnx':
+        exported = model.export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+        if int8:
+            _quantize_onnx(exported, target, calibration_dir, imgsz)
+            os.remove(exported)
+        else:
+            shutil.move(exported, target)
+    else:
+        options = {'format': 'openvino', 'imgsz': imgsz}
+        if int8:
+            options.update(int8=True, data=_write_calibration_yaml(calibration_dir, model.names))
+        else:
+            options['dynamic'] = True
+        exported = model.export(**options)
+        shutil.move(exported, target)
+    return target
+
+
+def load_model(model_name, backend='torch', int8=False, calibration_dir=None, imgsz=DEFAULT_IMGSZ):
+    """
+    Carrega o detector no backend escolhido
+
+    Todos os backends passam pelo ultralytics, então o pós-processamento
+    e o NMS são os mesmos independente de onde a inferência roda.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend inválido: {backend}. Opções: {', '.join(BACKENDS)}")
+
+    from ultralytics import YOLO
+
+    if backend == 'torch':
+        return YOLO(model_name)
+    return YOLO(export_model(model_name, backend, int8, calibration_dir, imgsz), task='detect')
+
+
+def capture_calibration_frames(source, output_dir, count=200, interval=0.5):
+    """Salva frames de uma câmera para usar na calibração INT8"""
+    os.makedirs(output_dir, exist_ok=True)
+    cap = cv2.VideoCapture(source)
+    saved = 0
+    try:
+        while saved < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            cv2.imwrite(os.path.join(output_dir, f"frame_{saved:05d}.jpg"), frame)
+            saved += 1
+            time.sleep(interval)
+    finally:
+        cap.release()
+    return saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o detector para ONNX/OpenVINO")
+    parser.add_argument("--modelo", default='yolov8n.pt')
+    parser.add_argument("--backend", choices=('onnx', 'openvino'), required=True)
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--calibracao", default='calibracao', help="Pasta com frames de calibração")
+    parser.add_argument("--capturar", type=int, default=0,
+                        help="Captura N frames da webcam para a pasta de calibração antes de exportar")
+    parser.add_argument("--fonte", default='0')
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    args = parser.parse_args()
+
+    if args.capturar:
+        fonte = int(args.fonte) if args.fonte.isdigit() else args.fonte
+        print(f"{capture_calibration_frames(fonte, args.calibracao, args.capturar)} frames capturados")
+    print(export_model(args.modelo, args.backend, args.int8, args.calibracao, args.imgsz))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,9 @@
+import os
 import sqlite3
+import json
+
+# Bancos já migrados neste processo (caminho absoluto)
+_esquemas_migrados = set()
 
 def criar_esquema_completo():
     """Cria todo o esquema do banco de dados com todas as tabelas e relacionamentos"""
@@ -47,10 +52,55 @@ def criar_esquema_completo():
     )
     ''')
     
+    # cameras_roi, deteccoes e a coluna cameras.fonte vêm de migrar_esquema
     conexao.commit()
     conexao.close()
+    migrar_esquema()
     print("Esquema completo criado com sucesso!")
 
+def migrar_esquema(caminho='monitoramento.db'):
+    """Adiciona colunas e tabelas novas a bancos criados com versões anteriores do esquema"""
+    conexao = sqlite3.connect(caminho)
+    cursor = conexao.cursor()
+    
+    cursor.execute('PRAGMA table_info(cameras)')
+    colunas = {coluna[1] for coluna in cursor.fetchall()}
+    if 'fonte' not in colunas:
+        # Índice da webcam ("0") ou caminho/URL aceito pelo OpenCV
+        cursor.execute('ALTER TABLE cameras ADD COLUMN fonte TEXT')
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS cameras_roi (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        camera_id INTEGER NOT NULL,
+        nome TEXT,
+        poligono TEXT NOT NULL,
+        FOREIGN KEY (camera_id) REFERENCES cameras(id) ON DELETE CASCADE
+    )
+    ''')
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS deteccoes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        camera TEXT NOT NULL,
+        ativo TEXT,
+        timestamp REAL NOT NULL,
+        x1 REAL, y1 REAL, x2 REAL, y2 REAL,
+        confianca REAL,
+        trilha INTEGER
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_deteccoes_timestamp ON deteccoes (timestamp)')
+    
+    conexao.commit()
+    conexao.close()
+    _esquemas_migrados.add(os.path.abspath(caminho))
+
+def garantir_esquema(caminho='monitoramento.db'):
+    """Executa `migrar_esquema` só na primeira chamada do processo para cada banco"""
+    if os.path.abspath(caminho) not in _esquemas_migrados:
+        migrar_esquema(caminho)
+
 # Funções para manipulação de ativos
 def inserir_ativo(nome, latitude, longitude):
     conexao = sqlite3.connect('monitoramento.db')
@@ -92,6 +142,51 @@ def associar_camera_ativo(ativo_id, camera_id):
     conexao.close()
     print("Associação câmera-ativo criada com sucesso!")
 
+def definir_fonte_camera(camera_id, fonte):
+    garantir_esquema()
+    conexao = sqlite3.connect('monitoramento.db')
+    cursor = conexao.cursor()
+    
+    cursor.execute('UPDATE cameras SET fonte = ? WHERE id = ?', (str(fonte), camera_id))
+    
+    conexao.commit()
+    conexao.close()
+    print(f"Fonte da câmera {camera_id} definida como {fonte}!")
+
+def inserir_roi(camera_id, pontos, nome=None):
+    """
+    Cadastra uma região de interesse para a câmera
+    
+    Args:
+        camera_id (int): ID da câmera
+        pontos (list): Vértices do polígono [(x, y), ...] em pixels do frame completo
+        nome (str): Nome da estrutura (ex.: "Esteira 2")
+    """
+    garantir_esquema()
+    conexao = sqlite3.connect('monitoramento.db')
+    cursor = conexao.cursor()
+    
+    cursor.execute('''
+    INSERT INTO cameras_roi (camera_id, nome, poligono)
+    VALUES (?, ?, ?)
+    ''', (camera_id, nome, json.dumps([[int(x), int(y)] for x, y in pontos])))
+    
+    conexao.commit()
+    conexao.close()
+    print("Região de interesse inserida com sucesso!")
+
+def listar_rois(camera_id):
+    """Retorna a lista de polígonos [[x, y], ...] cadastrados para a câmera"""
+    garantir_esquema()
+    conexao = sqlite3.connect('monitoramento.db')
+    cursor = conexao.cursor()
+    
+    cursor.execute('SELECT poligono FROM cameras_roi WHERE camera_id = ? ORDER BY id', (camera_id,))
+    rois = [json.loads(linha[0]) for linha in cursor.fetchall()]
+    
+    conexao.close()
+    return rois
+
 # Funções para manipulação de buzzers
 def inserir_buzzer(latitude, longitude, ativo_id=None):
     conexao = sqlite3.connect('monitoramento.db')
@@ -203,6 +298,66 @@ def listar_buzzers_com_ativos():
     
     return list(resultado.values())
 
+def listar_cameras_com_ativos():
+    """
+    Retorna as câmeras cadastradas com a fonte de vídeo e os ativos associados.
+    Formato de retorno:
+    [
+        {
+            "id": camera_id,
+            "nome": nome_da_camera,
+            "fonte": fonte_de_video (ou None),
+            "ativos": [nome_do_ativo, ...],
+            "rois": [[[x, y], ...], ...]
+        },
+        ...
+    ]
+    """
+    garantir_esquema()
+    conexao = sqlite3.connect('monitoramento.db')
+    cursor = conexao.cursor()
+    
+    cursor.execute('''
+    SELECT 
+        c.id,
+        c.nome,
+        c.fonte,
+        a.nome
+    FROM 
+        cameras c
+    LEFT JOIN 
+        ativos_cameras ac ON c.id = ac.camera_id
+    LEFT JOIN 
+        ativos a ON ac.ativo_id = a.id
+    ORDER BY 
+        c.id
+    ''')
+    
+    linhas = cursor.fetchall()
+    
+    # Todas as regiões de uma vez, em vez de uma consulta por câmera
+    cursor.execute('SELECT camera_id, poligono FROM cameras_roi ORDER BY id')
+    rois = cursor.fetchall()
+    conexao.close()
+    
+    resultado = {}
+    for camera_id, nome, fonte, ativo_nome in linhas:
+        camera = resultado.setdefault(camera_id, {
+            "id": camera_id,
+            "nome": nome,
+            "fonte": fonte,
+            "ativos": [],
+            "rois": []
+        })
+        if ativo_nome:
+            camera["ativos"].append(ativo_nome)
+    
+    for camera_id, poligono in rois:
+        if camera_id in resultado:
+            resultado[camera_id]["rois"].append(json.loads(poligono))
+    
+    return list(resultado.values())
+
 if __name__ == "__main__":
     # Criar todas as tabelas
     '''
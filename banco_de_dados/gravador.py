@@ -0,0 +1,96 @@
+import queue
+import sqlite3
+import threading
+import time
+
+from banco_de_dados.criacao import garantir_esquema
+
+
+class GravadorDeteccoes:
+    def __init__(self, caminho='monitoramento.db', tamanho_lote=200, intervalo=1.0,
+                 tamanho_fila=10000):
+        """
+        Grava detecções na tabela `deteccoes` a partir de uma thread própria
+
+        O loop da câmera só enfileira os eventos (sem bloquear); a thread
+        junta os eventos em lotes e grava com executemany numa única
+        transação, com o banco em modo WAL.
+
+        Args:
+            caminho (str): Arquivo do banco SQLite
+            tamanho_lote (int): Quantidade de linhas por commit
+            intervalo (float): Tempo máximo em segundos até gravar um lote incompleto
+            tamanho_fila (int): Linhas aguardando gravação antes de começar a descartar
+        """
+        self.caminho = caminho
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+        self.gravadas = 0
+        self.descartadas = 0
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        """Cria a tabela, se preciso, e inicia a thread de gravação"""
+        garantir_esquema(self.caminho)
+        self._thread = threading.Thread(target=self._executar, name="gravador_deteccoes", daemon=True)
+        self._thread.start()
+        return self
+
+    def registrar(self, camera, ativo, timestamp, deteccoes):
+        """
+        Enfileira as detecções de um frame sem bloquear o chamador
+
+        Args:
+            camera (str): Nome da câmera
+            ativo (str): Ativo associado
+            timestamp (float): Momento da captura do frame
+            deteccoes (np.ndarray): Detecções Nx6 ou Nx7 (com ID de trilha)
+        """
+        for deteccao in deteccoes.tolist():
+            trilha = int(deteccao[6]) if len(deteccao) > 6 and deteccao[6] >= 0 else None
+            try:
+                self.fila.put_nowait((camera, ativo, timestamp, *deteccao[:5], trilha))
+            except queue.Full:
+                self.descartadas += 1
+
+    def _executar(self):
+        conexao = sqlite3.connect(self.caminho)
+        conexao.execute('PRAGMA journal_mode=WAL')
+        conexao.execute('PRAGMA synchronous=NORMAL')
+        lote = []
+        prazo = time.time() + self.intervalo
+        try:
+            while not (self._parar.is_set() and self.fila.empty()):
+                try:
+                    lote.append(self.fila.get(timeout=max(0.0, prazo - time.time())))
+                except queue.Empty:
+                    pass
+                if len(lote) >= self.tamanho_lote or (lote and time.time() >= prazo):
+                    self._gravar(conexao, lote)
+                    lote = []
+                if time.time() >= prazo:
+                    prazo = time.time() + self.intervalo
+            if lote:
+                self._gravar(conexao, lote)
+        finally:
+            conexao.close()
+
+    def _gravar(self, conexao, lote):
+        try:
+            with conexao:
+                conexao.executemany('''
+                INSERT INTO deteccoes (camera, ativo, timestamp, x1, y1, x2, y2, confianca, trilha)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', lote)
+            self.gravadas += len(lote)
+        except sqlite3.Error as e:
+            self.descartadas += len(lote)
+            print(f"Erro ao gravar detecções: {e}")
+
+    def parar(self):
+        """Grava o que ainda estiver na fila e encerra a thread"""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
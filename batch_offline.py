@@ -0,0 +1,182 @@
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.m4v', '.ts')
+RESULT_COLUMNS = ('video', 'quadro', 'tempo_s', 'x1', 'y1', 'x2', 'y2', 'confianca')
+
+_worker = {}
+
+
+def find_videos(paths):
+    """Expande arquivos e pastas em uma lista ordenada de vídeos"""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(os.path.join(root, name) for name in files
+                              if name.lower().endswith(VIDEO_EXTENSIONS))
+        elif os.path.isfile(path):
+            videos.append(path)
+        else:
+            print(f"Ignorando {path}: não encontrado")
+    return sorted(videos)
+
+
+def split_ranges(video, chunk_size):
+    """Divide o vídeo em intervalos [início, fim) de até `chunk_size` frames"""
+    cap = cv2.VideoCapture(video)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    return [(video, start, min(start + chunk_size, total), fps)
+            for start in range(0, total, chunk_size)]
+
+
+def _init_worker(conf_threshold, threads):
+    # Um modelo por processo; limita as threads para os workers não disputarem os núcleos
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    cv2.setNumThreads(1)
+    import camera
+    camera.warm_up(camera.get_model())
+    _worker['camera'] = camera
+    _worker['conf'] = conf_threshold
+
+
+def process_range(video, start, end, fps, stride=1, batch_size=8):
+    """Roda a detecção nos frames [start, end) e retorna (frames processados, linhas)"""
+    camera = _worker['camera']
+    cap = cv2.VideoCapture(video)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    rows = []
+    processed = 0
+    batch, indices = [], []
+
+    def flush():
+        for index, detections in zip(indices, camera.detect_pigeons_in_batch(batch, camera.get_model(), _worker['conf'])):
+            for x1, y1, x2, y2, confidence in detections[:, :5].tolist():
+                rows.append((video, index, index / fps, x1, y1, x2, y2, confidence))
+        batch.clear()
+        indices.clear()
+
+    try:
+        for index in range(start, end):
+            if (index - start) % stride:
+                if not cap.grab():
+                    break
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            batch.append(frame)
+            indices.append(index)
+            processed += 1
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        cap.release()
+    return processed, rows
+
+
+class SQLiteSink:
+    def __init__(self, path):
+        self.conexao = sqlite3.connect(path)
+        self.conexao.execute('''
+        CREATE TABLE IF NOT EXISTS deteccoes_offline (
+            video TEXT NOT NULL,
+            quadro INTEGER NOT NULL,
+            tempo_s REAL,
+            x1 REAL, y1 REAL, x2 REAL, y2 REAL,
+            confianca REAL
+        )
+        ''')
+
+    def write(self, rows):
+        self.conexao.executemany('INSERT INTO deteccoes_offline VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        self.conexao.commit()
+
+    def close(self):
+        self.conexao.close()
+
+
+class ParquetSink:
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.schema = pa.schema([('video', pa.string()), ('quadro', pa.int64()), ('tempo_s', pa.float64()),
+                                 ('x1', pa.float32()), ('y1', pa.float32()), ('x2', pa.float32()),
+                                 ('y2', pa.float32()), ('confianca', pa.float32())])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        if rows:
+            columns = list(zip(*rows))
+            self.writer.write_table(self.pa.table(
+                {name: list(values) for name, values in zip(RESULT_COLUMNS, columns)}, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def run_batch(videos, output, workers, chunk_size, stride, batch_size, conf_threshold):
+    """Processa os vídeos em paralelo e retorna (frames processados, segundos)"""
+    ranges = [r for video in videos for r in split_ranges(video, chunk_size)]
+    sink = ParquetSink(output) if output.endswith('.parquet') else SQLiteSink(output)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    started = time.time()
+    total_frames = 0
+    total_detections = 0
+    context = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(conf_threshold, threads)) as executor:
+            futures = [executor.submit(process_range, *r, stride, batch_size) for r in ranges]
+            for done, future in enumerate(as_completed(futures), start=1):
+                processed, rows = future.result()
+                sink.write(rows)
+                total_frames += processed
+                total_detections += len(rows)
+                elapsed = time.time() - started
+                print(f"[{done}/{len(futures)}] {total_frames} frames, "
+                      f"{total_detections} detecções, {total_frames / max(elapsed, 1e-6):.1f} frames/s")
+    finally:
+        sink.close()
+    return total_frames, time.time() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocessa vídeos gravados em lote")
+    parser.add_argument("entradas", nargs="+", help="Arquivos de vídeo ou pastas")
+    parser.add_argument("--saida", default="deteccoes_offline.db", help="Arquivo .db (SQLite) ou .parquet")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--bloco", type=int, default=500, help="Frames por intervalo de trabalho")
+    parser.add_argument("--passo", type=int, default=1, help="Processa 1 a cada N frames")
+    parser.add_argument("--lote", type=int, default=8, help="Frames por chamada ao modelo")
+    parser.add_argument("--confianca", type=float, default=0.3)
+    args = parser.parse_args()
+
+    videos = find_videos(args.entradas)
+    if not videos:
+        exit("Nenhum vídeo encontrado.")
+    print(f"{len(videos)} vídeo(s), {args.workers} worker(s)")
+
+    frames, elapsed = run_batch(videos, args.saida, args.workers, args.bloco,
+                                args.passo, args.lote, args.confianca)
+    print(f"Total: {frames} frames em {elapsed:.1f}s ({frames / max(elapsed, 1e-6):.1f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import time
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS, load_model
+from camera import detect_pigeons_in_batch, warm_up
+
+DEFAULT_FRAME_SHAPE = (720, 1280)
+BUNDLED_IMAGE = 'pombo.png'
+
+
+def synthetic_frames(count=16, shape=DEFAULT_FRAME_SHAPE, seed=0):
+    """Frames determinísticos: cais em gradiente com ruído e algumas aves elípticas"""
+    rng = np.random.default_rng(seed)
+    height, width = shape
+    gradient = np.linspace(60, 200, height, dtype=np.float32)[:, None, None]
+    frames = []
+    for _ in range(count):
+        frame = np.broadcast_to(gradient, (height, width, 3)).copy()
+        frame += rng.normal(0, 8, frame.shape).astype(np.float32)
+        frame = np.clip(frame, 0, 255).astype(np.uint8)
+        for _ in range(rng.integers(0, 6)):
+            center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+            axes = (int(rng.integers(8, 40)), int(rng.integers(5, 25)))
+            color = tuple(int(c) for c in rng.integers(40, 140, 3))
+            cv2.ellipse(frame, center, axes, float(rng.integers(0, 180)), 0, 360, color, -1)
+        frames.append(frame)
+    return frames
+
+
+def load_frames(directory=None, count=16):
+    """Frames de uma pasta, a imagem do repositório e/ou frames sintéticos"""
+    frames = []
+    if directory:
+        for name in sorted(os.listdir(directory)):
+            image = cv2.imread(os.path.join(directory, name))
+            if image is not None:
+                frames.append(image)
+    elif os.path.exists(BUNDLED_IMAGE):
+        image = cv2.imread(BUNDLED_IMAGE)
+        if image is not None:
+            frames.append(cv2.resize(image, DEFAULT_FRAME_SHAPE[::-1]))
+    frames.extend(synthetic_frames(max(0, count - len(frames))))
+    return frames
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        'media': round(float(samples.mean()), 3),
+        'p50': round(float(np.percentile(samples, 50)), 3),
+        'p95': round(float(np.percentile(samples, 95)), 3),
+        'p99': round(float(np.percentile(samples, 99)), 3),
+    }
+
+
+def set_threads(threads):
+    # Só o PyTorch (e o pré-processamento do OpenCV) respeitam a troca em tempo de execução;
+    # as sessões ONNX Runtime/OpenVINO são criadas pelo ultralytics com o padrão do runtime
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def run_case(model, frames, imgsz, batch_size, iterations, warmup):
+    """Mede uma combinação e retorna latência por chamada e vazão em frames/s"""
+    batches = itertools.cycle([frames[i:i + batch_size] for i in range(0, len(frames), batch_size)
+                               if len(frames[i:i + batch_size]) == batch_size] or [frames[:batch_size]])
+    for _ in range(warmup):
+        detect_pigeons_in_batch(next(batches), model, imgsz=imgsz)
+
+    latencies = []
+    processed = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        batch = next(batches)
+        call_started = time.perf_counter()
+        detect_pigeons_in_batch(batch, model, imgsz=imgsz)
+        latencies.append((time.perf_counter() - call_started) * 1000)
+        processed += len(batch)
+    elapsed = time.perf_counter() - started
+    return {
+        'latencia_ms': percentiles(latencies),
+        'latencia_por_frame_ms': round(float(np.mean(latencies)) / batch_size, 3),
+        'fps': round(processed / elapsed, 2),
+    }
+
+
+def environment():
+    info = {
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'processador': platform.processor() or platform.machine(),
+        'nucleos': os.cpu_count(),
+        'opencv': cv2.__version__,
+    }
+    try:
+        import torch
+        info['torch'] = torch.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def case_key(case):
+    return (case['modelo'], case['backend'], case['imgsz'], case['lote'], case['threads'])
+
+
+def compare(results, baseline_path):
+    """Imprime a variação de p50 e FPS em relação a um JSON anterior"""
+    with open(baseline_path, encoding='utf-8') as arquivo:
+        baseline = {case_key(case): case for case in json.load(arquivo)['resultados']}
+    for case in results:
+        previous = baseline.get(case_key(case))
+        if previous is None:
+            continue
+        p50_change = (case['latencia_ms']['p50'] / previous['latencia_ms']['p50'] - 1) * 100
+        fps_change = (case['fps'] / previous['fps'] - 1) * 100
+        print(f"{case_key(case)}: p50 {p50_change:+.1f}%, fps {fps_change:+.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do caminho de detecção (CPU, offline)")
+    parser.add_argument("--modelos", nargs="+", default=['yolov8n.pt'],
+                        help="Pesos locais; nada é baixado durante o benchmark")
+    parser.add_argument("--backends", nargs="+", default=['torch'], choices=BACKENDS)
+    parser.add_argument("--resolucoes", nargs="+", type=int, default=[320, 640])
+    parser.add_argument("--lotes", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--threads", nargs="+", type=int, default=[os.cpu_count() or 1],
+                        help="Só varia o backend torch; os demais usam o padrão do runtime")
+    parser.add_argument("--iteracoes", type=int, default=30)
+    parser.add_argument("--aquecimento", type=int, default=3)
+    parser.add_argument("--frames", default=None, help="Pasta com frames gravados (opcional)")
+    parser.add_argument("--saida", default="benchmark.json")
+    parser.add_argument("--comparar", default=None, help="JSON de uma execução anterior")
+    args = parser.parse_args()
+
+    for modelo in args.modelos:
+        if not os.path.exists(modelo):
+            exit(f"Pesos {modelo} não encontrados localmente; o benchmark roda offline.")
+
+    frames = load_frames(args.frames, count=max(16, max(args.lotes)))
+    results = []
+    for modelo, backend in itertools.product(args.modelos, args.backends):
+        for imgsz in args.resolucoes:
+            # Backends exportados fixam a resolução de entrada, então cada imgsz tem seu artefato
+            model = load_model(modelo, backend, imgsz=imgsz)
+            warm_up(model, imgsz)
+            # Nos demais backends o número de threads não é controlável daqui: uma só
+            # rodada, registrada com threads=None em vez de um valor que não foi aplicado
+            thread_counts = args.threads if backend == 'torch' else [None]
+            for batch_size, threads in itertools.product(args.lotes, thread_counts):
+                if threads is not None:
+                    set_threads(threads)
+                case = {'modelo': modelo, 'backend': backend, 'imgsz': imgsz,
+                        'lote': batch_size, 'threads': threads}
+                case.update(run_case(model, frames, imgsz, batch_size, args.iteracoes, args.aquecimento))
+                results.append(case)
+                print(f"{modelo} {backend} imgsz={imgsz} lote={batch_size} "
+                      f"threads={threads if threads is not None else 'padrão'}: "
+                      f"{case['fps']} fps, p50 {case['latencia_ms']['p50']} ms, "
+                      f"p99 {case['latencia_ms']['p99']} ms")
+
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump({'ambiente': environment(), 'timestamp': time.time(), 'resultados': results},
+                  arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultados salvos em {args.saida}")
+
+    if args.comparar:
+        compare(results, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import sqlite3
+import threading
+import time
+
+
+class CaixaSaida:
+    def __init__(self, caminho="mqtt_saida.db"):
+        """
+        Fila persistente (SQLite em modo WAL) das mensagens que não puderam ser enviadas
+
+        As mensagens ficam em ordem de chegada. Mensagens de estado (retidas
+        ou de tópicos como `ativos/`) podem ser compactadas: só o valor mais
+        recente de cada tópico sobrevive, já que os anteriores não têm mais
+        efeito. A linha é apagada assim que o paho aceita a mensagem: daí em
+        diante é ele quem a reenvia se a conexão cair, e mantê-la aqui faria o
+        broker recebê-la duas vezes.
+
+        Args:
+            caminho (str): Arquivo do banco SQLite
+        """
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self.conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self.conexao.execute('PRAGMA journal_mode=WAL')
+        self.conexao.execute('PRAGMA synchronous=NORMAL')
+        with self.conexao:
+            self.conexao.execute('''
+            CREATE TABLE IF NOT EXISTS saida (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topico TEXT NOT NULL,
+                payload BLOB,
+                qos INTEGER NOT NULL,
+                reter INTEGER NOT NULL,
+                estado INTEGER NOT NULL,
+                criado REAL NOT NULL
+            )
+            ''')
+
+    def adicionar(self, topico, payload, qos=1, reter=False, estado=False):
+        """
+        Guarda uma mensagem já serializada
+
+        Args:
+            topico (str): Tópico MQTT
+            payload (str/bytes): Conteúdo já serializado
+            qos (int): Qualidade de serviço usada no reenvio
+            reter (bool): Se True, mensagem fica retida no broker
+            estado (bool): Se True, só a mais recente do tópico é reenviada
+        """
+        if isinstance(payload, str):
+            payload = payload.encode()
+        with self._lock, self.conexao:
+            self.conexao.execute(
+                'INSERT INTO saida (topico, payload, qos, reter, estado, criado) VALUES (?, ?, ?, ?, ?, ?)',
+                (topico, payload, qos, int(reter), int(estado), time.time()))
+
+    def compactar(self):
+        """
+        Remove os valores de estado superados por um mais recente do mesmo tópico
+
+        Returns:
+            int: Quantidade de mensagens removidas
+        """
+        with self._lock, self.conexao:
+            cursor = self.conexao.execute('''
+            DELETE FROM saida WHERE estado = 1 AND id NOT IN (
+                SELECT MAX(id) FROM saida WHERE estado = 1 GROUP BY topico
+            )
+            ''')
+            return cursor.rowcount
+
+    def proximas(self, limite=50):
+        """
+        Retorna as mensagens mais antigas
+
+        Returns:
+            list: [(id, tópico, payload, qos, reter), ...] em ordem de chegada
+        """
+        with self._lock:
+            return [(id_, topico, payload, qos, bool(reter)) for id_, topico, payload, qos, reter in
+                    self.conexao.execute('SELECT id, topico, payload, qos, reter FROM saida '
+                                         'ORDER BY id LIMIT ?', (limite,))]
+
+    def remover(self, ids):
+        """Apaga as mensagens já confirmadas pelo broker"""
+        with self._lock, self.conexao:
+            self.conexao.executemany('DELETE FROM saida WHERE id = ?', [(id_,) for id_ in ids])
+
+    def __len__(self):
+        with self._lock:
+            return self.conexao.execute('SELECT COUNT(*) FROM saida').fetchone()[0]
+
+    def fechar(self):
+        with self._lock:
+            self.conexao.close()
@@ -1,8 +1,13 @@
+import time
+_import_started = time.perf_counter()
+import threading
 import cv2
-import torch
 import numpy as np
-from ultralytics import YOLO
-import time
+from backends import load_model
+from metrics import StageTimer
+from overlay import OverlayRenderer, GREEN, RED, WHITE, YELLOW, GRAY
+from pipeline import LatestFrameGrabber, DetectionPipeline
+from tracker import IoUTracker, TrackingDetector
 
 MODEL_NAME = 'yolov8n.pt'
 BIRD_CLASS_ID = 14
@@ -11,133 +16,151 @@ NMS_THRESHOLD = 0.45
 WEBCAM_ID = 0
 DISPLAY_WIDTH = 1280
 DISPLAY_HEIGHT = 720
+INFERENCE_BACKEND = 'torch'  # 'torch', 'onnx' ou 'openvino'
+INT8_QUANTIZATION = False
+CALIBRATION_DIR = 'calibracao'
+TRACKING_MODE = False
+DETECT_EVERY_N = 5
 
-model = YOLO(MODEL_NAME)
+# torch/ultralytics só são importados quando a detecção começa (get_model)
+model = None
+_model_lock = threading.Lock()
+STARTUP_TIMES = {}
 
-def detect_pigeons_in_frame(frame, model, conf_threshold=CONFIDENCE_THRESHOLD):
-    results = model(frame, conf=conf_threshold, verbose=False)
-    pigeon_detections = []
-    
-    for result in results:
-        boxes = result.boxes
-        if boxes is not None:
-            for box in boxes:
-                if int(box.cls) == BIRD_CLASS_ID:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = box.conf[0].cpu().numpy()
-                    pigeon_detections.append({
-                        'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                        'confidence': float(confidence),
-                        'label': 'Pombo',
-                        'class_id': 0
-                    })
-    return pigeon_detections
-
-def draw_detections(frame, detections, fps=0):
-    frame_copy = frame.copy()
-    height, width = frame.shape[:2]
+def get_model():
+    global model
+    with _model_lock:
+        if model is None:
+            started = time.perf_counter()
+            model = load_model(MODEL_NAME, INFERENCE_BACKEND, INT8_QUANTIZATION, CALIBRATION_DIR)
+            STARTUP_TIMES['carregar_modelo'] = time.perf_counter() - started
+    return model
+
+def warm_up(model, imgsz=None, runs=2):
+    # A primeira inferência paga inicialização de kernels e alocações; paga aqui, não no 1º frame real
+    started = time.perf_counter()
+    frame = np.zeros((DISPLAY_HEIGHT, DISPLAY_WIDTH, 3), dtype=np.uint8)
+    for _ in range(runs):
+        model(frame, **inference_options(CONFIDENCE_THRESHOLD, imgsz))
+    STARTUP_TIMES['aquecimento'] = time.perf_counter() - started
+
+def startup_report():
+    report = {name: round(seconds * 1000, 1) for name, seconds in STARTUP_TIMES.items()}
+    report['total'] = round(sum(STARTUP_TIMES.values()) * 1000, 1)
+    return report
+
+DETECTION_COLUMNS = ('x1', 'y1', 'x2', 'y2', 'confidence', 'class_id')
+
+def empty_detections():
+    return np.empty((0, len(DETECTION_COLUMNS)), dtype=np.float32)
+
+def extract_pigeon_detections(result):
+    # Uma única cópia dispositivo -> host por frame: [x1, y1, x2, y2, conf, cls]
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return empty_detections()
+    data = boxes.data[:, :6].cpu().numpy().astype(np.float32, copy=False)
+    return data[data[:, 5] == BIRD_CLASS_ID]
+
+def detections_as_dicts(detections):
+    return [{
+        'bbox': [int(x1), int(y1), int(x2), int(y2)],
+        'confidence': float(confidence),
+        'label': 'Pombo',
+        'class_id': 0
+    } for x1, y1, x2, y2, confidence in detections[:, :5].tolist()]
+
+def inference_options(conf_threshold, imgsz=None):
+    options = {'conf': conf_threshold, 'iou': NMS_THRESHOLD,
+               'classes': [BIRD_CLASS_ID], 'verbose': False}
+    if imgsz is not None:
+        options['imgsz'] = imgsz
+    return options
+
+def record_stage_times(timer, result, extraction_ms):
+    # result.speed traz os tempos do ultralytics em ms por imagem
+    speed = getattr(result, 'speed', None) or {}
+    timer.record('preprocessamento', speed.get('preprocess', 0.0))
+    timer.record('inferencia', speed.get('inference', 0.0))
+    timer.record('posprocessamento', speed.get('postprocess', 0.0) + extraction_ms)
+
+def detect_pigeons_in_frame(frame, model, conf_threshold=CONFIDENCE_THRESHOLD, imgsz=None, timer=None):
+    results = model(frame, **inference_options(conf_threshold, imgsz))
+    started = time.perf_counter()
+    detections = extract_pigeon_detections(results[0])
+    if timer is not None:
+        record_stage_times(timer, results[0], (time.perf_counter() - started) * 1000)
+    return detections
+
+def detect_pigeons_in_batch(frames, model, conf_threshold=CONFIDENCE_THRESHOLD, imgsz=None, timer=None):
+    if not frames:
+        return []
+    results = model(frames, **inference_options(conf_threshold, imgsz))
+    started = time.perf_counter()
+    batch_detections = [extract_pigeon_detections(result) for result in results]
+    if timer is not None:
+        record_stage_times(timer, results[0], (time.perf_counter() - started) * 1000 / len(results))
+    return batch_detections
+
+CONTROL_LINES = [
+    ("", WHITE),
+    ("Controles:", YELLOW),
+    ("ESC/Q - Sair", GRAY),
+    ("+ - Mais sensivel", GRAY),
+    ("- - Menos sensivel", GRAY),
+    ("R - Reset", GRAY),
+    ("M - Salvar metricas", GRAY),
+]
+
+renderer = OverlayRenderer(CONTROL_LINES)
+timer = StageTimer()
+
+def draw_detections(frame, detections, fps=0, conf_threshold=CONFIDENCE_THRESHOLD):
+    # O retorno é o buffer reutilizado do renderer: copie se for guardar o frame
     has_pigeon = len(detections) > 0
-    
-    if has_pigeon:
-        for detection in detections:
-            x1, y1, x2, y2 = detection['bbox']
-            confidence = detection['confidence']
-            cv2.rectangle(frame_copy, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            text = f"Pombo: {confidence:.2f}"
-            text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-            cv2.rectangle(frame_copy, (x1, y1 - text_size[1] - 10), 
-                         (x1 + text_size[0] + 5, y1), (0, 255, 0), -1)
-            cv2.putText(frame_copy, text, (x1 + 2, y1 - 5), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-    
-    if has_pigeon:
-        status_text = "POMBO DETECTADO!"
-        status_color = (0, 255, 0)
-        bg_color = (0, 150, 0)
-    else:
-        status_text = "NENHUM POMBO"
-        status_color = (0, 0, 255)
-        bg_color = (0, 0, 150)
-    
-    text_size = cv2.getTextSize(status_text, cv2.FONT_HERSHEY_SIMPLEX, 1.5, 3)[0]
-    text_x = (width - text_size[0]) // 2
-    text_y = 80
-    
-    cv2.rectangle(frame_copy, 
-                  (text_x - 20, text_y - text_size[1] - 20),
-                  (text_x + text_size[0] + 20, text_y + 10),
-                  bg_color, -1)
-    cv2.rectangle(frame_copy, 
-                  (text_x - 20, text_y - text_size[1] - 20),
-                  (text_x + text_size[0] + 20, text_y + 10),
-                  status_color, 3)
-    cv2.putText(frame_copy, status_text, (text_x, text_y), 
-               cv2.FONT_HERSHEY_SIMPLEX, 1.5, status_color, 3)
-    
-    info_texts = [
-        f"FPS: {fps:.1f}",
-        f"Status: {'SIM' if has_pigeon else 'NAO'}",
-        f"Confianca: {CONFIDENCE_THRESHOLD:.1f}",
-        f"Deteccoes: {len(detections)}",
-        "",
-        "Controles:",
-        "ESC/Q - Sair",
-        "+ - Mais sensivel",
-        "- - Menos sensivel",
-        "R - Reset"
+    info_lines = [
+        (f"FPS: {fps:.1f}", WHITE),
+        (f"Status: {'SIM' if has_pigeon else 'NAO'}", GREEN if has_pigeon else RED),
+        (f"Confianca: {conf_threshold:.1f}", WHITE),
+        (f"Deteccoes: {len(detections)}", WHITE),
     ]
-    
-    info_height = len(info_texts) * 22 + 20
-    cv2.rectangle(frame_copy, (10, 10), (250, info_height), (0, 0, 0), -1)
-    cv2.rectangle(frame_copy, (10, 10), (250, info_height), (255, 255, 255), 1)
-    
-    for i, text in enumerate(info_texts):
-        if text == "":
-            continue
-        y_pos = 30 + i * 22
-        if "Status:" in text:
-            color = (0, 255, 0) if has_pigeon else (0, 0, 255)
-        elif "Controles:" in text:
-            color = (255, 255, 0)
-        elif text.startswith(("ESC", "+", "-", "R")):
-            color = (200, 200, 200)
-        else:
-            color = (255, 255, 255)
-        cv2.putText(frame_copy, text, (15, y_pos), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.45, color, 1)
-    
-    circle_color = (0, 255, 0) if has_pigeon else (0, 0, 255)
-    circle_center = (width - 50, 50)
-    cv2.circle(frame_copy, circle_center, 30, circle_color, -1)
-    cv2.circle(frame_copy, circle_center, 30, (255, 255, 255), 2)
-    circle_text = "✓" if has_pigeon else "✗"
-    cv2.putText(frame_copy, circle_text, (width - 62, 60), 
-               cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
-    
-    return frame_copy
+    return renderer.render(frame, detections, info_lines)
 
 def run_realtime_pigeon_detection():
-    cap = cv2.VideoCapture(WEBCAM_ID)
-    if not cap.isOpened():
+    model = get_model()
+    warm_up(model)
+    print(f"Inicialização (ms): {startup_report()}")
+    current_confidence = CONFIDENCE_THRESHOLD
+    grabber = LatestFrameGrabber(WEBCAM_ID, DISPLAY_WIDTH, DISPLAY_HEIGHT, timer=timer)
+    detect_fn = lambda frame: detect_pigeons_in_frame(frame, model, current_confidence, timer=timer)
+    tracking = None
+    if TRACKING_MODE:
+        # O rastreador precisa das detecções fracas para manter as trilhas (estilo ByteTrack)
+        tracking = TrackingDetector(
+            lambda frame: detect_pigeons_in_frame(frame, model, min(0.1, current_confidence), timer=timer),
+            IoUTracker(high_threshold=current_confidence), DETECT_EVERY_N)
+        detect_fn = tracking
+    pipeline = DetectionPipeline(grabber, detect_fn)
+    if not pipeline.start():
         return False
     
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, DISPLAY_WIDTH)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, DISPLAY_HEIGHT)
-    
     frame_count = 0
     fps_counter = 0
     fps_timer = time.time()
     frames_with_pigeon = 0
     frames_without_pigeon = 0
-    current_confidence = CONFIDENCE_THRESHOLD
     
     try:
         while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            detections = detect_pigeons_in_frame(frame, model, current_confidence)
+            item = pipeline.get(timeout=0.1)
+            if item is None:
+                if not pipeline.running:
+                    break
+                if (cv2.waitKey(1) & 0xFF) in (27, ord('q')):
+                    break
+                continue
+            frame, detections, captured_at = item
+            timer.record('latencia_total', (time.time() - captured_at) * 1000)
             has_pigeon = len(detections) > 0
             
             if has_pigeon:
@@ -153,8 +176,10 @@ def run_realtime_pigeon_detection():
             else:
                 fps = fps_counter / max(time.time() - fps_timer, 0.01)
             
-            frame_with_detections = draw_detections(frame, detections, fps)
-            cv2.imshow('Deteccao de Pombos', frame_with_detections)
+            with timer.stage('desenho'):
+                frame_with_detections = draw_detections(frame, detections, fps, current_confidence)
+            with timer.stage('exibicao'):
+                cv2.imshow('Deteccao de Pombos', frame_with_detections)
             
             key = cv2.waitKey(1) & 0xFF
             if key == 27 or key == ord('q'):
@@ -165,6 +190,10 @@ def run_realtime_pigeon_detection():
                 current_confidence = min(0.9, current_confidence + 0.1)
             elif key == ord('r'):
                 current_confidence = CONFIDENCE_THRESHOLD
+            elif key == ord('m'):
+                print(f"Métricas salvas em {timer.dump('metricas_camera.json')}")
+            if tracking is not None:
+                tracking.tracker.high_threshold = current_confidence
             
             frame_count += 1
     
@@ -173,8 +202,10 @@ def run_realtime_pigeon_detection():
     except Exception as e:
         pass
     finally:
-        cap.release()
+        pipeline.stop()
         cv2.destroyAllWindows()
+        if tracking is not None:
+            print(f"Pombos distintos: {tracking.tracker.distinct_count}")
         return True
 
 def test_webcam():
@@ -208,5 +239,7 @@ def main():
         return False
     return run_realtime_pigeon_detection()
 
+STARTUP_TIMES['import_camera'] = time.perf_counter() - _import_started
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
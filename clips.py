@@ -0,0 +1,172 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+CLIPS_DIR = 'clipes'
+
+
+class ClipRecorder:
+    """
+    Grava clipes de evidência com alguns segundos antes e depois de cada evento
+
+    Os frames recentes ficam num buffer circular em memória; quando o estado
+    de presença liga, o buffer (pré-evento) e os frames seguintes são
+    enviados a uma thread de codificação com `cv2.VideoWriter`, de modo que o
+    loop de detecção nunca espera pelo disco. O clipe termina `post_seconds`
+    depois do estado desligar ou ao atingir `max_seconds`.
+
+    A memória usada é limitada por `max_memory_mb` para o buffer e o mesmo
+    valor para a fila do codificador; se o disco não acompanhar, frames do
+    clipe são descartados (contados em `dropped`) em vez de crescer a fila.
+    Em 720p a 30 fps, 5 s de pré-evento ocupam ~400 MB; se o limite cortar o
+    pré-evento antes de `pre_seconds`, um aviso mostra a duração efetiva e a
+    memória necessária (`pre_roll_seconds` guarda a duração efetiva).
+
+    Args:
+        camera (str): Nome da câmera, usado no nome dos arquivos
+        directory (str): Pasta de saída
+        pre_seconds (float): Segundos mantidos antes do evento
+        post_seconds (float): Segundos gravados depois do fim do evento
+        max_seconds (float): Duração máxima de um clipe
+        max_memory_mb (float): Limite do buffer circular em MB
+        codec (str): FourCC do `cv2.VideoWriter`
+    """
+
+    def __init__(self, camera, directory=CLIPS_DIR, pre_seconds=5.0, post_seconds=5.0,
+                 max_seconds=120.0, max_memory_mb=256, codec='mp4v'):
+        self.camera = camera
+        self.directory = directory
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_seconds = max_seconds
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self.codec = codec
+        self.buffer = deque()
+        self.buffer_bytes = 0
+        self.recording_until = None
+        self.clip_started = None
+        self.clips = 0
+        self.dropped = 0
+        self.pre_roll_seconds = pre_seconds
+        self._encoder_queue = None
+        self._queued_bytes = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._encoder_queue = queue.Queue()
+        self._thread = threading.Thread(target=self._encode, name="codificador_clipes", daemon=True)
+        self._thread.start()
+        return self
+
+    @property
+    def recording(self):
+        return self.recording_until is not None
+
+    def _estimate_fps(self):
+        if len(self.buffer) < 2:
+            return 10.0
+        span = self.buffer[-1][0] - self.buffer[0][0]
+        return (len(self.buffer) - 1) / span if span > 0 else 10.0
+
+    def _enqueue(self, item, nbytes=0):
+        with self._lock:
+            if nbytes and self._queued_bytes + nbytes > self.max_bytes:
+                self.dropped += 1
+                return
+            self._queued_bytes += nbytes
+        self._encoder_queue.put((item, nbytes))
+
+    def update(self, frame, timestamp, active):
+        """
+        Registra um frame; deve ser chamado para todos os frames processados
+
+        Os frames de `cv2.VideoCapture.read` são novos a cada leitura, então
+        são guardados sem cópia; não passe buffers reutilizados.
+
+        Args:
+            frame (np.ndarray): Frame BGR original
+            timestamp (float): Momento da captura
+            active (bool): Estado de presença (já com histerese)
+        """
+        if active and not self.recording:
+            self.clip_started = timestamp
+            name = time.strftime('%Y%m%d_%H%M%S', time.localtime(timestamp))
+            path = os.path.join(self.directory, f"{self.camera}_{name}.mp4".replace(" ", "_"))
+            height, width = frame.shape[:2]
+            self._enqueue(('abrir', path, self._estimate_fps(), (width, height)))
+            # O pré-evento passa do buffer para a fila do codificador
+            while self.buffer:
+                _, old = self.buffer.popleft()
+                self._enqueue(('frame', old), old.nbytes)
+            self.buffer_bytes = 0
+            self.clips += 1
+
+        if self.recording or active:
+            if active:
+                self.recording_until = timestamp + self.post_seconds
+            self._enqueue(('frame', frame), frame.nbytes)
+            if timestamp >= self.recording_until or timestamp - self.clip_started >= self.max_seconds:
+                self._enqueue(('fechar',))
+                self.recording_until = None
+            return
+
+        self.buffer.append((timestamp, frame))
+        self.buffer_bytes += frame.nbytes
+        while self.buffer:
+            span = timestamp - self.buffer[0][0]
+            if span <= self.pre_seconds:
+                if self.buffer_bytes <= self.max_bytes:
+                    break
+                if self.pre_roll_seconds == self.pre_seconds and span > 0:
+                    needed_mb = self.buffer_bytes / span * self.pre_seconds / (1024 * 1024)
+                    print(f"Clipes de {self.camera}: o limite de {self.max_bytes / (1024 * 1024):.0f} MB "
+                          f"guarda só {span:.1f}s de pré-evento (pedidos {self.pre_seconds:.1f}s, "
+                          f"~{needed_mb:.0f} MB); aumente --clipes-memoria ou reduza --pre-evento")
+                self.pre_roll_seconds = min(self.pre_roll_seconds, span)
+            _, old = self.buffer.popleft()
+            self.buffer_bytes -= old.nbytes
+
+    def _encode(self):
+        writer = None
+        size = None
+        while True:
+            item, nbytes = self._encoder_queue.get()
+            with self._lock:
+                self._queued_bytes -= nbytes
+            kind = item[0]
+            if kind == 'abrir':
+                if writer is not None:
+                    writer.release()
+                _, path, fps, size = item
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.codec), fps, size)
+                if not writer.isOpened():
+                    print(f"Não foi possível criar o clipe {path}")
+                    writer = None
+            elif kind == 'frame':
+                if writer is not None:
+                    frame = item[1]
+                    if (frame.shape[1], frame.shape[0]) != size:
+                        frame = cv2.resize(frame, size)
+                    writer.write(frame)
+            elif kind == 'fechar':
+                if writer is not None:
+                    writer.release()
+                    writer = None
+            elif kind == 'parar':
+                if writer is not None:
+                    writer.release()
+                return
+
+    def stop(self):
+        """Fecha o clipe em andamento e espera o codificador terminar a fila"""
+        if self._thread is None:
+            return
+        self._enqueue(('parar',))
+        self._thread.join(timeout=30.0)
+        self._thread = None
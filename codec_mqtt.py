@@ -0,0 +1,109 @@
+import json
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+# Tópicos com este sufixo carregam payload binário; os demais continuam JSON/texto
+SUFIXO_BINARIO = "/bin"
+
+VERSAO = 1
+TIPO_DETECCOES = 1
+# Classe COCO "bird" (camera.BIRD_CLASS_ID), repetida aqui para não importar o modelo
+CLASSE_POMBO = 14
+
+# versão, tipo, timestamp da captura, número de detecções
+CABECALHO = struct.Struct("<BBdH")
+# x1, y1, x2, y2 em pixels, confiança em 1/255, ID de trilha (-1 sem rastreamento)
+REGISTRO = np.dtype([("x1", "<u2"), ("y1", "<u2"), ("x2", "<u2"), ("y2", "<u2"),
+                     ("confianca", "u1"), ("trilha", "<i4")])
+
+Deteccoes = namedtuple("Deteccoes", ["timestamp", "deteccoes"])
+
+
+def topico_binario(topico):
+    return topico + SUFIXO_BINARIO
+
+
+def codificar_deteccoes(timestamp, deteccoes):
+    """
+    Codifica as detecções de um frame no formato binário v1
+
+    12 bytes de cabeçalho mais 13 bytes por detecção, contra ~90 bytes por
+    detecção em JSON.
+
+    Args:
+        timestamp (float): Momento da captura
+        deteccoes (np.ndarray): Detecções Nx6 ou Nx7 (com ID de trilha)
+
+    Returns:
+        bytes: Payload
+    """
+    quantidade = min(len(deteccoes), 0xFFFF)
+    registros = np.empty(quantidade, dtype=REGISTRO)
+    if quantidade:
+        caixas = np.clip(np.rint(deteccoes[:quantidade, :4]), 0, 0xFFFF)
+        registros["x1"], registros["y1"], registros["x2"], registros["y2"] = caixas.T
+        registros["confianca"] = np.clip(np.rint(deteccoes[:quantidade, 4] * 255), 0, 255)
+        registros["trilha"] = deteccoes[:quantidade, 6] if deteccoes.shape[1] > 6 else -1
+    return CABECALHO.pack(VERSAO, TIPO_DETECCOES, timestamp, quantidade) + registros.tobytes()
+
+
+def decodificar_deteccoes(payload, como_array=False):
+    """
+    Decodifica um payload binário de detecções
+
+    Args:
+        payload (bytes): Payload recebido
+        como_array (bool): Retorna as detecções como array Nx7
+            [x1, y1, x2, y2, conf, classe, trilha], o mesmo layout do rastreador,
+            em vez de dicionários no formato do JSON
+
+    Returns:
+        dict: {"versao", "timestamp", "deteccoes"}
+    """
+    versao, tipo, timestamp, quantidade = CABECALHO.unpack_from(payload, 0)
+    if versao != VERSAO or tipo != TIPO_DETECCOES:
+        raise ValueError(f"Payload binário não suportado (versão {versao}, tipo {tipo})")
+    registros = np.frombuffer(payload, dtype=REGISTRO, count=quantidade, offset=CABECALHO.size)
+    if como_array:
+        deteccoes = np.empty((quantidade, 7), dtype=np.float32)
+        for coluna, campo in enumerate(("x1", "y1", "x2", "y2")):
+            deteccoes[:, coluna] = registros[campo]
+        deteccoes[:, 4] = registros["confianca"] / 255.0
+        deteccoes[:, 5] = CLASSE_POMBO
+        deteccoes[:, 6] = registros["trilha"]
+    else:
+        deteccoes = [{
+            "bbox": [x1, y1, x2, y2],
+            "confidence": round(confianca / 255.0, 3),
+            "label": "Pombo",
+            "class_id": 0,
+            **({"trilha": trilha} if trilha >= 0 else {}),
+        } for x1, y1, x2, y2, confianca, trilha in registros.tolist()]
+    return {"versao": versao, "timestamp": timestamp, "deteccoes": deteccoes}
+
+
+def serializar(mensagem):
+    """Converte a mensagem no payload enviado ao broker (dict -> JSON, Deteccoes -> binário)"""
+    if isinstance(mensagem, Deteccoes):
+        return codificar_deteccoes(*mensagem)
+    if isinstance(mensagem, dict):
+        return json.dumps(mensagem, ensure_ascii=False)
+    return mensagem
+
+
+def desserializar(topico, payload):
+    """
+    Decodifica um payload recebido de acordo com o tópico
+
+    Tópicos terminados em `/bin` usam o formato binário; os demais tentam
+    JSON e, se não for JSON, retornam o texto (ex.: "True"/"False" dos buzzers).
+    """
+    if topico.endswith(SUFIXO_BINARIO):
+        return decodificar_deteccoes(payload)
+    texto = payload.decode()
+    try:
+        return json.loads(texto)
+    except json.JSONDecodeError:
+        return texto
@@ -1,16 +1,19 @@
 import paho.mqtt.client as mqtt
-import json
+import time
+import codec_mqtt
 
 class ConsumidorMQTT:
-    def __init__(self, client_id="consumidor_python"):
+    def __init__(self, client_id="consumidor_python", verbose=True):
         """
         Inicializa o consumidor MQTT para Mosquitto local
         
         Args:
             client_id (str): ID do cliente (opcional)
+            verbose (bool): Se False, não imprime cada mensagem recebida
         """
         self.broker = "localhost"
         self.port = 1883
+        self.verbose = verbose
         self.client = mqtt.Client(client_id=client_id)
         
         # Configura callbacks
@@ -21,10 +24,16 @@ class ConsumidorMQTT:
         # Dicionário para armazenar as últimas mensagens por tópico
         self.ultimas_mensagens = {}
         
+        # Inscrições refeitas a cada (re)conexão
+        self.inscricoes = {}
+        
     def _on_connect(self, client, userdata, flags, rc):
         """Callback quando conecta ao broker"""
         if rc == 0:
-            print(f"Conectado ao broker Mosquitto em {self.broker}:{self.port}")
+            if self.verbose:
+                print(f"Conectado ao broker Mosquitto em {self.broker}:{self.port}")
+            for topico, qos in self.inscricoes.items():
+                self.client.subscribe(topico, qos=qos)
         else:
             print(f"Falha na conexão. Código: {rc}")
 
@@ -35,16 +44,14 @@ class ConsumidorMQTT:
     def _on_message(self, client, userdata, msg):
         """Callback quando recebe uma mensagem"""
         try:
-            # Tenta decodificar JSON, se não for possível, usa o payload direto
-            try:
-                payload = json.loads(msg.payload.decode())
-            except json.JSONDecodeError:
-                payload = msg.payload.decode()
+            # Binário nos tópicos /bin; nos demais JSON ou, se não for JSON, o texto
+            payload = codec_mqtt.desserializar(msg.topic, msg.payload)
             
-            print(f"\nNova mensagem recebida:")
-            print(f"Tópico: {msg.topic}")
-            print(f"QoS: {msg.qos}")
-            print(f"Payload: {payload}")
+            if self.verbose:
+                print(f"\nNova mensagem recebida:")
+                print(f"Tópico: {msg.topic}")
+                print(f"QoS: {msg.qos}")
+                print(f"Payload: {payload}")
             
             # Armazena a última mensagem recebida para cada tópico
             self.ultimas_mensagens[msg.topic] = {
@@ -57,9 +64,21 @@ class ConsumidorMQTT:
         except Exception as e:
             print(f"Erro ao processar mensagem: {e}")
 
-    def conectar(self):
-        """Conecta ao broker e inicia o loop"""
+    def conectar(self, esperar=True):
+        """
+        Conecta ao broker e inicia o loop
+        
+        Args:
+            esperar (bool): Se False, conecta em segundo plano sem bloquear
+                (as inscrições são feitas assim que a conexão sair)
+        """
         try:
+            if not esperar:
+                self.client.reconnect_delay_set(min_delay=1, max_delay=60)
+                self.client.connect_async(self.broker, self.port)
+                self.client.loop_start()
+                return True
+            self.client.reconnect_delay_set(min_delay=1, max_delay=60)
             self.client.connect(self.broker, self.port)
             self.client.loop_start()
             time.sleep(1)  # Pausa para estabilizar conexão
@@ -76,6 +95,9 @@ class ConsumidorMQTT:
             topico (str): Tópico para se inscrever
             qos (int): Qualidade de serviço desejada
         """
+        self.inscricoes[topico] = qos
+        if not self.client.is_connected():
+            return
         result, mid = self.client.subscribe(topico, qos=qos)
         if result == mqtt.MQTT_ERR_SUCCESS:
             print(f"Solicitada inscrição no tópico: {topico} (QoS: {qos})")
@@ -103,8 +125,6 @@ class ConsumidorMQTT:
 
 # Exemplo de uso do consumidor
 if __name__ == "__main__":
-    import time
-    
     # Cria o consumidor
     consumidor = ConsumidorMQTT()
     
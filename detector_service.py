@@ -0,0 +1,370 @@
+import argparse
+import signal
+import time
+
+from adaptive import AdaptiveResolution, AdaptiveDetector, DEFAULT_SIZES
+from banco_de_dados.criacao import listar_cameras_com_ativos, listar_rois
+from banco_de_dados.gravador import GravadorDeteccoes
+from camera import (CONFIDENCE_THRESHOLD, NMS_THRESHOLD, DETECT_EVERY_N, DISPLAY_WIDTH, DISPLAY_HEIGHT,
+                    WEBCAM_ID, get_model, warm_up, startup_report, detect_pigeons_in_frame,
+                    detect_pigeons_in_batch, detections_as_dicts)
+from clips import ClipRecorder
+from codec_mqtt import Deteccoes, topico_binario
+from frame_ring import FrameRingWriter, ring_name
+from motion import MotionGate, MotionGatedDetector
+from metrics import StageTimer
+from mqtt import MosquittoLocalClient, PublicadorEstado
+from overlay import OverlayRenderer, GREEN, RED, WHITE
+from pipeline import LatestFrameGrabber, DetectionPipeline
+from preview import PreviewEncoder, MJPEGServer
+from roi import RegionDetector
+from tracker import IoUTracker, TrackingDetector
+
+MJPEG_PORT = 8090
+SUMMARY_INTERVAL = 1.0
+
+
+def detection_topic(camera):
+    return f"deteccoes/{camera}"
+
+
+def summary_topic(camera):
+    return f"deteccoes/{camera}/resumo"
+
+
+class DetectorService:
+    """
+    Serviço de detecção sem interface, independente do Streamlit
+
+    Roda um único loop de captura e inferência por câmera e publica:
+      - `ativos/<ativo>`: "True"/"False" para os buzzers, só nas transições
+        (com histerese) e num heartbeat de baixa frequência
+      - `deteccoes/<camera>/bin` (ou `deteccoes/<camera>` em JSON): detecções
+        de cada frame processado (QoS 0)
+      - `deteccoes/<camera>/resumo`: estatísticas retidas, uma vez por segundo
+      - a prévia anotada num servidor MJPEG, para os visualizadores
+      - frames anotados e detecções num anel de memória compartilhada
+        (opcional), lido sem cópia por visualizadores na mesma máquina
+      - clipes de evidência com pré e pós-evento (opcional)
+
+    Com `rois`, o modelo só vê os recortes das regiões de interesse da
+    câmera (como em `multicamera.py`), em vez do frame inteiro.
+
+    Args:
+        cliente (MosquittoLocalClient): Cliente MQTT já conectado
+        source (int/str): Fonte de vídeo
+        camera (str): Nome da câmera usado nos tópicos
+        ativo (str): Ativo cujo buzzer é acionado
+        conf_threshold (float): Limiar de confiança
+        motion_gate (MotionGate): Filtro de movimento (opcional)
+        detect_every (int): Se > 1, ativa o modo rastreamento com detector a cada N frames
+        preview (PreviewEncoder): Gerador da prévia
+        mjpeg_server (MJPEGServer): Servidor da prévia (opcional)
+        shared_memory (bool): Publica no anel `frame_ring.ring_name(camera)`
+        reconnect (bool): Reabre a fonte após falhas (None = só RTSP/HTTP)
+        adaptive (AdaptiveResolution): Ajusta imgsz e passo à meta de FPS (opcional)
+        binary (bool): Publica as detecções no formato binário de codec_mqtt
+        publicador (PublicadorEstado): Publicador do estado do ativo (opcional)
+        gravador (GravadorDeteccoes): Persiste as detecções no banco (opcional)
+        clips (ClipRecorder): Grava clipes quando o estado do ativo liga (opcional)
+        rois (list): Polígonos [[x, y], ...] de `cameras_roi`; vazio usa o frame inteiro
+    """
+
+    def __init__(self, cliente, source, camera, ativo, conf_threshold=CONFIDENCE_THRESHOLD,
+                 motion_gate=None, detect_every=1, preview=None, mjpeg_server=None,
+                 shared_memory=False, publicador=None, gravador=None, clips=None,
+                 reconnect=None, adaptive=None, binary=True, rois=None):
+        self.cliente = cliente
+        self.binary = binary
+        self.gravador = gravador
+        self.clips = clips
+        self.publicador = publicador or PublicadorEstado(cliente, f"ativos/{ativo}")
+        self.camera = camera
+        self.ativo = ativo
+        self.conf_threshold = conf_threshold
+        self.preview = preview or PreviewEncoder()
+        self.mjpeg_server = mjpeg_server
+        self.renderer = OverlayRenderer()
+        self.timer = StageTimer()
+        self.shared_memory = shared_memory
+        self.ring = None
+
+        # O rastreador precisa das detecções fracas para manter as trilhas (estilo ByteTrack)
+        self.detect_conf = 0.1 if detect_every > 1 else self.conf_threshold
+        self.regions = None
+        if rois:
+            self.regions = RegionDetector(self.infer_batch, rois, iou_threshold=NMS_THRESHOLD)
+        self.adaptive = adaptive
+        if adaptive is not None:
+            detect_fn = AdaptiveDetector(self.infer, adaptive)
+        else:
+            detect_fn = self.infer
+        if motion_gate is not None:
+            detect_fn = MotionGatedDetector(detect_fn, motion_gate)
+        self.tracking = None
+        if detect_every > 1:
+            self.tracking = TrackingDetector(detect_fn, IoUTracker(high_threshold=conf_threshold),
+                                             detect_every)
+            detect_fn = self.tracking
+
+        self.pipeline = DetectionPipeline(
+            LatestFrameGrabber(source, DISPLAY_WIDTH, DISPLAY_HEIGHT, timer=self.timer,
+                               reconnect=reconnect), detect_fn)
+        self.frames_with_pigeon = 0
+        self.frames_without_pigeon = 0
+
+    def infer_batch(self, crops, imgsz=None):
+        return detect_pigeons_in_batch(crops, get_model(), self.detect_conf, imgsz, timer=self.timer)
+
+    def infer(self, frame, imgsz=None):
+        """Detecções Nx6 do frame, só dentro das regiões de interesse se houver"""
+        if self.regions is None:
+            return detect_pigeons_in_frame(frame, get_model(), self.detect_conf, imgsz, timer=self.timer)
+        crops, windows = self.regions.prepare(frame)
+        return self.regions.merge(windows, self.infer_batch(crops, imgsz))
+        self.fps = 0.0
+
+    def summary(self):
+        total = self.frames_with_pigeon + self.frames_without_pigeon
+        resumo = {
+            "camera": self.camera,
+            "ativo": self.ativo,
+            "timestamp": time.time(),
+            "fps": round(self.fps, 1),
+            "frames_com_pombo": self.frames_with_pigeon,
+            "frames_sem_pombo": self.frames_without_pigeon,
+            "taxa_deteccao": self.frames_with_pigeon / total if total else 0.0,
+            "estagios": self.timer.snapshot(),
+        }
+        if hasattr(self.cliente, "status_publicacao"):
+            resumo["mqtt"] = self.cliente.status_publicacao()
+        if self.tracking is not None:
+            resumo["pombos_distintos"] = self.tracking.tracker.distinct_count
+        if self.mjpeg_server is not None:
+            resumo["mjpeg_porta"] = self.mjpeg_server.port
+        if self.adaptive is not None:
+            resumo["resolucao_adaptativa"] = self.adaptive.state()
+        grabber = self.pipeline.grabber
+        resumo["camera_conectada"] = grabber.connected
+        resumo["reconexoes"] = grabber.reconnections
+        if self.clips is not None:
+            resumo["clipes"] = self.clips.clips
+            resumo["clipes_frames_descartados"] = self.clips.dropped
+            resumo["clipes_pre_evento_s"] = round(self.clips.pre_roll_seconds, 1)
+        return resumo
+
+    def draw(self, frame, detections):
+        has_pigeon = len(detections) > 0
+        info_lines = [
+            (f"FPS: {self.fps:.1f}", WHITE),
+            (f"Status: {'SIM' if has_pigeon else 'NAO'}", GREEN if has_pigeon else RED),
+            (f"Confianca: {self.conf_threshold:.1f}", WHITE),
+            (f"Deteccoes: {len(detections)}", WHITE),
+        ]
+        return self.renderer.render(frame, detections, info_lines)
+
+    def handle(self, frame, detections, captured_at):
+        self.timer.record('latencia_total', (time.time() - captured_at) * 1000)
+        has_pigeon = len(detections) > 0
+        if has_pigeon:
+            self.frames_with_pigeon += 1
+        else:
+            self.frames_without_pigeon += 1
+
+        with self.timer.stage('publicacao_mqtt'):
+            self.publicador.atualizar(has_pigeon)
+            if self.binary:
+                self.cliente.publicar(topico_binario(detection_topic(self.camera)),
+                                      Deteccoes(captured_at, detections), qos=0)
+            else:
+                self.cliente.publicar(detection_topic(self.camera), {
+                    "timestamp": captured_at,
+                    "deteccoes": detections_as_dicts(detections),
+                }, qos=0)
+        if self.gravador is not None and has_pigeon:
+            self.gravador.registrar(self.camera, self.ativo, captured_at, detections)
+        if self.clips is not None:
+            self.clips.update(frame, captured_at, bool(self.publicador.estado))
+
+        annotated = None
+        if self.shared_memory:
+            with self.timer.stage('desenho'):
+                annotated = self.draw(frame, detections)
+            with self.timer.stage('memoria_compartilhada'):
+                if self.ring is not None and self.ring.layout.shape != annotated.shape:
+                    # A fonte reconectou com outra resolução: recria o anel com o mesmo
+                    # nome, e os visualizadores reabrem quando o antigo para de avançar
+                    self.ring.close()
+                    self.ring = None
+                if self.ring is None:
+                    self.ring = FrameRingWriter(ring_name(self.camera), annotated.shape)
+                self.ring.write(annotated, detections, captured_at)
+
+        if self.mjpeg_server is not None and self.preview.due():
+            if annotated is None:
+                with self.timer.stage('desenho'):
+                    annotated = self.draw(frame, detections)
+            with self.timer.stage('codificacao'):
+                jpeg = self.preview.encode(annotated)
+            if jpeg is not None:
+                with self.timer.stage('exibicao'):
+                    self.mjpeg_server.publish(jpeg)
+
+    def dump_metrics(self, *args):
+        """Grava as métricas por estágio em metricas_<camera>.json (também via SIGUSR1)"""
+        path = self.timer.dump(f"metricas_{self.camera}.json")
+        print(f"Métricas salvas em {path}")
+
+    def run(self):
+        # Modelo carregado e aquecido antes de abrir a câmera: o 1º frame já sai na velocidade normal
+        warm_up(get_model())
+        print(f"Inicialização (ms): {startup_report()}")
+        if not self.pipeline.start():
+            return False
+
+        fps_counter = 0
+        fps_timer = time.time()
+        summary_timer = 0.0
+        try:
+            while True:
+                item = self.pipeline.get(timeout=0.1)
+                if item is None:
+                    if not self.pipeline.running:
+                        break
+                    continue
+
+                fps_counter += 1
+                if time.time() - fps_timer > 1.0:
+                    self.fps = fps_counter / (time.time() - fps_timer)
+                    fps_counter = 0
+                    fps_timer = time.time()
+
+                self.handle(*item)
+
+                if time.time() - summary_timer >= SUMMARY_INTERVAL:
+                    summary_timer = time.time()
+                    self.cliente.sobrescrever(summary_topic(self.camera), self.summary(), qos=0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.pipeline.stop()
+            if self.clips is not None:
+                self.clips.stop()
+            if self.ring is not None:
+                self.ring.close()
+        return True
+
+
+def carregar_rois(camera, camera_id=None):
+    """
+    Regiões de interesse cadastradas para a câmera, pelo ID ou pelo nome
+
+    Returns:
+        list: Polígonos [[x, y], ...]; vazio se a câmera não está cadastrada
+    """
+    if camera_id is not None:
+        return listar_rois(camera_id)
+    for registro in listar_cameras_com_ativos():
+        if registro["nome"] == camera:
+            return registro["rois"]
+    print(f"Câmera {camera} não cadastrada no banco; inferência no frame inteiro (use --camera-id)")
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço de detecção de pombos sem interface")
+    parser.add_argument("--fonte", default=str(WEBCAM_ID), help="Índice da webcam ou caminho/URL")
+    parser.add_argument("--reconectar", action="store_true", default=None,
+                        help="Reabre a fonte após falhas também para arquivos e webcams "
+                             "(fontes RTSP/HTTP sempre reconectam)")
+    parser.add_argument("--camera", default="EMAP", help="Nome da câmera nos tópicos deteccoes/<camera>")
+    parser.add_argument("--ativo", default="EMAP", help="Ativo acionado em ativos/<ativo>")
+    parser.add_argument("--camera-id", type=int, default=None,
+                        help="ID da câmera no banco, para carregar as regiões de interesse "
+                             "(padrão: procura pelo nome em --camera)")
+    parser.add_argument("--sem-roi", action="store_true",
+                        help="Infere sobre o frame inteiro mesmo com regiões cadastradas")
+    parser.add_argument("--confianca", type=float, default=CONFIDENCE_THRESHOLD)
+    parser.add_argument("--movimento", action="store_true", help="Só roda o YOLO quando a cena muda")
+    parser.add_argument("--reverificacao", type=float, default=5.0,
+                        help="Intervalo máximo sem inferência com o filtro de movimento (s)")
+    parser.add_argument("--rastreamento", type=int, default=1, metavar="N",
+                        help=f"Roda o detector a cada N frames e rastreia entre eles (ex.: {DETECT_EVERY_N})")
+    parser.add_argument("--fps-alvo", type=float, default=None,
+                        help="Ajusta imgsz e passo para acompanhar esta taxa (desativado por padrão)")
+    parser.add_argument("--resolucoes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Resoluções permitidas no modo adaptativo")
+    parser.add_argument("--passo-max", type=int, default=3,
+                        help="Passo máximo entre frames inferidos no modo adaptativo")
+    parser.add_argument("--formato-deteccoes", choices=["bin", "json"], default="bin",
+                        help="bin: deteccoes/<camera>/bin compacto; json: deteccoes/<camera> legado")
+    parser.add_argument("--janela", type=int, default=8, help="Frames considerados na histerese")
+    parser.add_argument("--min-ligar", type=int, default=5, help="Frames com pombo na janela para ligar")
+    parser.add_argument("--max-desligar", type=int, default=1,
+                        help="Frames com pombo na janela abaixo ou igual ao qual desliga")
+    parser.add_argument("--heartbeat", type=float, default=30.0, help="Republicação do estado (s)")
+    parser.add_argument("--sem-gravacao", action="store_true",
+                        help="Não persiste as detecções na tabela deteccoes")
+    parser.add_argument("--clipes", action="store_true",
+                        help="Grava clipes de evidência quando o estado do ativo liga")
+    parser.add_argument("--pre-evento", type=float, default=5.0, help="Segundos antes do evento (s)")
+    parser.add_argument("--pos-evento", type=float, default=5.0, help="Segundos depois do evento (s)")
+    parser.add_argument("--clipes-memoria", type=float, default=256,
+                        help="Memória máxima do buffer de pré-evento (MB)")
+    parser.add_argument("--memoria-compartilhada", action="store_true",
+                        help="Publica frames e detecções num anel de memória compartilhada")
+    parser.add_argument("--mjpeg-porta", type=int, default=MJPEG_PORT, help="0 desativa a prévia")
+    parser.add_argument("--previa-largura", type=int, default=640)
+    parser.add_argument("--previa-qualidade", type=int, default=70)
+    parser.add_argument("--previa-fps", type=float, default=10.0)
+    args = parser.parse_args()
+
+    # Fila de saída assíncrona: o loop da câmera nunca espera pelo broker
+    cliente = MosquittoLocalClient(f"detector_{args.camera}", assincrono=True,
+                                   caixa_saida=f"mqtt_saida_{args.camera}.db")
+    if not cliente.connect():
+        print("Mosquitto indisponível; os comandos ficam na caixa de saída até a conexão voltar.")
+
+    rois = [] if args.sem_roi else carregar_rois(args.camera, args.camera_id)
+    if rois:
+        print(f"Inferência restrita a {len(rois)} região(ões) de interesse")
+
+    mjpeg_server = MJPEGServer(port=args.mjpeg_porta).start() if args.mjpeg_porta else None
+    gravador = None if args.sem_gravacao else GravadorDeteccoes().iniciar()
+    service = DetectorService(
+        cliente,
+        int(args.fonte) if args.fonte.isdigit() else args.fonte,
+        args.camera,
+        args.ativo,
+        args.confianca,
+        motion_gate=MotionGate(recheck_interval=args.reverificacao) if args.movimento else None,
+        detect_every=args.rastreamento,
+        preview=PreviewEncoder(args.previa_largura, args.previa_qualidade, args.previa_fps),
+        mjpeg_server=mjpeg_server,
+        shared_memory=args.memoria_compartilhada,
+        reconnect=args.reconectar,
+        binary=args.formato_deteccoes == "bin",
+        adaptive=AdaptiveResolution(args.fps_alvo, args.resolucoes, args.passo_max)
+        if args.fps_alvo else None,
+        publicador=PublicadorEstado(cliente, f"ativos/{args.ativo}", args.janela,
+                                    args.min_ligar, args.max_desligar, args.heartbeat),
+        gravador=gravador,
+        clips=ClipRecorder(args.camera, pre_seconds=args.pre_evento, post_seconds=args.pos_evento,
+                           max_memory_mb=args.clipes_memoria).start() if args.clipes else None,
+        rois=rois,
+    )
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, service.dump_metrics)
+    try:
+        if not service.run():
+            exit("Não foi possível abrir a câmera.")
+    finally:
+        if mjpeg_server is not None:
+            mjpeg_server.stop()
+        if gravador is not None:
+            gravador.parar()
+        cliente.disconnect()
+
+
+if __name__ == "__main__":
+    main()
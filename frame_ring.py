@@ -0,0 +1,208 @@
+import argparse
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+MAGIC = b"MTRB"
+VERSION = 1
+DETECTION_COLS = 7  # [x1, y1, x2, y2, conf, cls, id]; id = -1 sem rastreamento
+
+# magic, versão, slots, altura, largura, canais, máx. detecções, seq. mais recente
+HEADER = struct.Struct("<4sIIIIIIQ")
+# seq. inicial, seq. final, timestamp, número de detecções
+SLOT_HEADER = struct.Struct("<QQdI4x")
+
+# Anéis criados por este processo (o resource_tracker é compartilhado com os leitores locais)
+_owned_names = set()
+
+
+def ring_name(camera):
+    return f"muttley_{camera}".replace(" ", "_").replace("/", "_")
+
+
+class _Layout:
+    def __init__(self, slots, height, width, channels, max_detections):
+        self.slots = slots
+        self.shape = (height, width, channels)
+        self.max_detections = max_detections
+        self.frame_bytes = height * width * channels
+        self.detection_bytes = max_detections * DETECTION_COLS * 4
+        self.slot_bytes = SLOT_HEADER.size + self.frame_bytes + self.detection_bytes
+        self.size = HEADER.size + slots * self.slot_bytes
+
+    def slot_offset(self, index):
+        return HEADER.size + index * self.slot_bytes
+
+
+class FrameRingWriter:
+    """
+    Publica frames anotados e detecções num ring buffer em memória compartilhada
+
+    Cada slot tem um número de sequência gravado antes e depois dos dados;
+    leitores comparam os dois para saber se leram um slot estável. O
+    escritor nunca espera pelos leitores, então acrescentar leitores não
+    deixa o detector mais lento.
+
+    Args:
+        name (str): Nome do bloco de memória compartilhada
+        shape (tuple): (altura, largura, canais) dos frames
+        slots (int): Quantidade de frames mantidos no anel
+        max_detections (int): Detecções guardadas por frame
+    """
+
+    def __init__(self, name, shape, slots=4, max_detections=64):
+        self.layout = _Layout(slots, *shape, max_detections)
+        try:
+            # Remove um bloco que sobrou de uma execução anterior interrompida
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=self.layout.size)
+        _owned_names.add(name)
+        self.seq = 0
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, slots, *shape, max_detections, 0)
+        self._frames = []
+        self._detections = []
+        for index in range(slots):
+            offset = self.layout.slot_offset(index) + SLOT_HEADER.size
+            self._frames.append(np.ndarray(self.layout.shape, np.uint8, self.shm.buf, offset))
+            self._detections.append(np.ndarray((max_detections, DETECTION_COLS), np.float32,
+                                               self.shm.buf, offset + self.layout.frame_bytes))
+
+    def write(self, frame, detections, timestamp=None):
+        """Copia o frame e as detecções (Nx6 ou Nx7) para o próximo slot"""
+        if frame.shape != self.layout.shape:
+            raise ValueError(f"Frame {frame.shape} diferente do anel {self.layout.shape}")
+        self.seq += 1
+        index = self.seq % self.layout.slots
+        offset = self.layout.slot_offset(index)
+        count = min(len(detections), self.layout.max_detections)
+
+        SLOT_HEADER.pack_into(self.shm.buf, offset, self.seq, 0, 0.0, 0)
+        np.copyto(self._frames[index], frame)
+        if count:
+            cols = min(detections.shape[1], DETECTION_COLS)
+            target = self._detections[index]
+            target[:count, :cols] = detections[:count, :cols]
+            target[:count, cols:] = -1
+        SLOT_HEADER.pack_into(self.shm.buf, offset, self.seq, self.seq,
+                              timestamp if timestamp is not None else time.time(), count)
+        struct.pack_into("<Q", self.shm.buf, HEADER.size - 8, self.seq)
+        return self.seq
+
+    def close(self):
+        self._frames = []
+        self._detections = []
+        self.shm.close()
+        self.shm.unlink()
+        _owned_names.discard(self.shm.name.lstrip("/"))
+
+
+class FrameRingReader:
+    """
+    Lê o ring buffer publicado por um FrameRingWriter sem copiar os dados
+
+    Os arrays retornados por `latest` apontam direto para a memória
+    compartilhada e valem até o escritor dar a volta no anel; use
+    `is_valid(seq)` depois de usá-los, ou `copy=True` para obter cópias
+    já validadas.
+
+    Args:
+        name (str): Nome do bloco de memória compartilhada
+    """
+
+    def __init__(self, name):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # O leitor não é dono do bloco: sem isso o resource_tracker o removeria ao sair
+        if name not in _owned_names:
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        magic, version, slots, height, width, channels, max_detections, _ = \
+            HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.shm.close()
+            raise ValueError(f"Bloco {name} não é um anel de frames compatível")
+        self.layout = _Layout(slots, height, width, channels, max_detections)
+
+    @property
+    def write_seq(self):
+        return struct.unpack_from("<Q", self.shm.buf, HEADER.size - 8)[0]
+
+    def _slot(self, seq):
+        offset = self.layout.slot_offset(seq % self.layout.slots)
+        return offset, SLOT_HEADER.unpack_from(self.shm.buf, offset)
+
+    def is_valid(self, seq):
+        """True se o slot de `seq` ainda não foi sobrescrito"""
+        _, (begin, end, _, _) = self._slot(seq)
+        return begin == end == seq
+
+    def latest(self, after=0, copy=False):
+        """
+        Retorna (seq, timestamp, frame, detecções) do frame mais recente
+
+        Args:
+            after (int): Só retorna se houver frame com sequência maior que esta
+            copy (bool): Copia os dados e valida o slot antes de retornar
+
+        Returns:
+            tuple/None: None se não houver frame novo e estável
+        """
+        seq = self.write_seq
+        if seq == 0 or seq <= after:
+            return None
+        offset, (begin, end, timestamp, count) = self._slot(seq)
+        if not begin == end == seq:
+            return None
+        frame_offset = offset + SLOT_HEADER.size
+        frame = np.ndarray(self.layout.shape, np.uint8, self.shm.buf, frame_offset)
+        detections = np.ndarray((count, DETECTION_COLS), np.float32, self.shm.buf,
+                                frame_offset + self.layout.frame_bytes)
+        if copy:
+            frame, detections = frame.copy(), detections.copy()
+            if not self.is_valid(seq):
+                return None
+        return seq, timestamp, frame, detections
+
+    def close(self):
+        self.shm.close()
+
+
+def main():
+    from preview import PreviewEncoder, MJPEGServer
+
+    parser = argparse.ArgumentParser(description="Serve em MJPEG os frames do anel de memória compartilhada")
+    parser.add_argument("--camera", default="EMAP")
+    parser.add_argument("--mjpeg-porta", type=int, default=8091)
+    parser.add_argument("--previa-largura", type=int, default=640)
+    parser.add_argument("--previa-qualidade", type=int, default=70)
+    parser.add_argument("--previa-fps", type=float, default=10.0)
+    args = parser.parse_args()
+
+    reader = FrameRingReader(ring_name(args.camera))
+    preview = PreviewEncoder(args.previa_largura, args.previa_qualidade, args.previa_fps)
+    server = MJPEGServer(port=args.mjpeg_porta).start()
+    last_seq = 0
+    try:
+        while True:
+            time.sleep(1.0 / args.previa_fps)
+            item = reader.latest(after=last_seq)
+            if item is None:
+                continue
+            seq, _, frame, _ = item
+            jpeg = preview.encode(frame, force=True)
+            if jpeg is not None and reader.is_valid(seq):
+                server.publish(jpeg)
+                last_seq = seq
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+STAGES = ('captura', 'preprocessamento', 'inferencia', 'posprocessamento',
+          'publicacao_mqtt', 'desenho', 'memoria_compartilhada', 'codificacao', 'exibicao',
+          'latencia_total')
+
+
+class StageTimer:
+    """
+    Histogramas móveis de latência por estágio do loop da câmera
+
+    Guarda as últimas `window` medições (em ms) de cada estágio; pode ser
+    alimentado por várias threads ao mesmo tempo.
+
+    Args:
+        window (int): Quantidade de amostras mantidas por estágio
+    """
+
+    def __init__(self, window=300):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, elapsed_ms):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(elapsed_ms)
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    def snapshot(self):
+        """Retorna {estágio: {amostras, media, p50, p95, p99, max}} em ms"""
+        with self._lock:
+            copies = {stage: np.array(samples) for stage, samples in self._samples.items() if samples}
+        ordered = sorted(copies, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES))
+        return {
+            stage: {
+                'amostras': int(len(copies[stage])),
+                'media': round(float(copies[stage].mean()), 2),
+                'p50': round(float(np.percentile(copies[stage], 50)), 2),
+                'p95': round(float(np.percentile(copies[stage], 95)), 2),
+                'p99': round(float(np.percentile(copies[stage], 99)), 2),
+                'max': round(float(copies[stage].max()), 2),
+            }
+            for stage in ordered
+        }
+
+    def dump(self, path):
+        """Grava o snapshot atual em JSON"""
+        with open(path, 'w', encoding='utf-8') as arquivo:
+            json.dump({'timestamp': time.time(), 'estagios': self.snapshot()},
+                      arquivo, ensure_ascii=False, indent=2)
+        return path
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
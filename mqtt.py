@@ -1,51 +1,210 @@
 import paho.mqtt.client as mqtt
+import os
+import threading
 import time
-import json
+import uuid
+import codec_mqtt
+from caixa_saida import CaixaSaida
+from collections import deque, OrderedDict
+from concurrent.futures import Future, wait
+
+# Confirmações sem Future registrado guardadas à espera de _enviar; o registro
+# acontece milissegundos depois do publish, então basta uma janela curta
+MAX_CONFIRMADOS = 1000
+
+# Resultado do Future de uma mensagem que foi para a caixa de saída: não foi
+# entregue agora, mas será reenviada quando a conexão voltar
+GUARDADA = "guardada"
 
 class MosquittoLocalClient:
-    def __init__(self, client_id=""):
+    def __init__(self, client_id="", assincrono=False, tamanho_fila=1000,
+                 topicos_estado=("ativos/",), verbose=False, caixa_saida=None,
+                 taxa_esvaziamento=50.0):
         """
         Inicializa o cliente para Mosquitto local
         
+        No modo assíncrono, `publicar` só enfileira a mensagem e retorna; uma
+        thread própria serializa e envia. Tópicos de estado (prefixos em
+        `topicos_estado` ou mensagens retidas) guardam apenas o valor mais
+        recente ainda não enviado; as demais mensagens vão para uma fila
+        limitada que descarta as mais antigas quando enche.
+        
+        Com `caixa_saida`, mensagens com QoS > 0 publicadas sem conexão vão
+        para um banco SQLite e são reenviadas em ordem, a no máximo
+        `taxa_esvaziamento` mensagens por segundo, quando a conexão voltar;
+        de cada tópico de estado só o valor mais recente é reenviado.
+        
         Args:
             client_id (str): ID do cliente (opcional)
+            assincrono (bool): Se True, `publicar` nunca bloqueia na rede
+            tamanho_fila (int): Mensagens aguardando envio antes de descartar
+            topicos_estado (tuple): Prefixos de tópicos em que só o último valor importa
+            verbose (bool): Se True, imprime cada confirmação de publicação
+            caixa_saida (str): Arquivo SQLite da caixa de saída (None desativa)
+            taxa_esvaziamento (float): Mensagens por segundo ao esvaziar a caixa
         """
         # Configurações padrão para Mosquitto local
         self.broker = "localhost"  # Ou "127.0.0.1"
         self.port = 1883           # Porta padrão do Mosquitto
         self.keepalive = 60        # Keepalive em segundos
+        self.reconexao_min = 1     # Espera inicial entre tentativas de reconexão (s)
+        self.reconexao_max = 60    # Espera máxima entre tentativas de reconexão (s)
+        
+        # Saúde da conexão
+        self.client_id = client_id
+        self.conectado = False
+        self.conectado_desde = None
+        self.desconexoes = 0
+        self.ultimo_erro = None
+        
+        self.assincrono = assincrono
+        self.tamanho_fila = tamanho_fila
+        self.topicos_estado = tuple(topicos_estado)
+        self.verbose = verbose
+        self.estatisticas = {
+            "enfileiradas": 0,
+            "enviadas": 0,
+            "confirmadas": 0,
+            "coalescidas": 0,
+            "descartadas": 0,
+            "erros": 0,
+            "guardadas": 0,
+            "reenviadas": 0,
+            "compactadas": 0,
+        }
+        
+        # Fila de saída: mensagens comuns em ordem e o último valor de cada tópico de estado
+        self._fila = deque()
+        self._estados = OrderedDict()
+        self._condicao = threading.Condition()
+        self._pendentes = {}
+        # mid -> instante da confirmação que chegou antes do Future ser registrado
+        self._confirmados = OrderedDict()
+        self._lock_pendentes = threading.Lock()
+        # True enquanto o loop de rede do paho roda (e, portanto, reconecta e reenvia)
+        self._loop_ativo = False
+        self._thread_envio = None
+        self._parar_envio = False
+        
+        # Caixa de saída persistente para quedas do broker
+        self.caixa_saida = CaixaSaida(caixa_saida) if caixa_saida else None
+        self.taxa_esvaziamento = taxa_esvaziamento
+        self._lock_caixa = threading.Lock()
+        self._caixa_pendente = self.caixa_saida is not None and len(self.caixa_saida) > 0
+        self._sinal_esvaziar = threading.Event()
+        self._parar_caixa = threading.Event()
+        self._thread_caixa = None
+        if self.caixa_saida is not None:
+            self._thread_caixa = threading.Thread(target=self._esvaziar_caixa, name="mqtt_caixa_saida",
+                                                  daemon=True)
+            self._thread_caixa.start()
         
         self.client = mqtt.Client(client_id=client_id)
         self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
         self.client.on_publish = self._on_publish
+        # O loop do paho reconecta sozinho, dobrando a espera até reconexao_max
+        self.client.reconnect_delay_set(min_delay=self.reconexao_min, max_delay=self.reconexao_max)
     
     def _on_connect(self, client, userdata, flags, rc):
         """Callback quando conecta ao broker"""
         if rc == 0:
-            pass
+            self.conectado = True
+            self.conectado_desde = time.time()
+            self._sinal_esvaziar.set()
             #print(f"Conectado ao Mosquitto em {self.broker}:{self.port}")
         else:
-            print(f"Falha na conexão. Código: {rc}")
+            self.ultimo_erro = f"Falha na conexão. Código: {rc}"
+            print(self.ultimo_erro)
+
+    def _on_disconnect(self, client, userdata, rc):
+        """Callback quando a conexão cai (rc != 0) ou é encerrada"""
+        self.conectado = False
+        self.conectado_desde = None
+        if rc != 0:
+            self.desconexoes += 1
+            self.ultimo_erro = f"Conexão perdida. Código: {rc}"
 
     def _on_publish(self, client, userdata, mid):
         """Callback quando publica mensagem"""
-        print(f"Mensagem publicada (ID: {mid})")
+        self.estatisticas["confirmadas"] += 1
+        if self.verbose:
+            print(f"Mensagem publicada (ID: {mid})")
+        self._resolver(mid, True)
+
+    def _resolver(self, mid, entregue):
+        with self._lock_pendentes:
+            futuros = self._pendentes.pop(mid, None)
+            if futuros is None:
+                # O paho chama on_publish antes de marcar a mensagem como publicada,
+                # então a confirmação pode chegar antes do registro em _enviar
+                self._confirmados[mid] = time.monotonic()
+                self._confirmados.move_to_end(mid)
+                if len(self._confirmados) > MAX_CONFIRMADOS:
+                    self._confirmados.popitem(last=False)
+        for futuro in futuros or ():
+            if not futuro.done():
+                futuro.set_result(entregue)
 
-    def connect(self):
-        """Conecta ao broker Mosquitto local"""
+    def connect(self, esperar=True):
+        """
+        Conecta ao broker Mosquitto local
+        
+        Args:
+            esperar (bool): Se False, conecta em segundo plano sem bloquear; o
+                loop do paho continua tentando até o broker responder
+        """
         try:
+            if not esperar:
+                self.client.connect_async(self.broker, self.port, self.keepalive)
+                self.client.loop_start()
+                self._loop_ativo = True
+                return True
             self.client.connect(self.broker, self.port, self.keepalive)
             self.client.loop_start()
+            self._loop_ativo = True
             time.sleep(0.5)  # Pequena pausa para estabilizar
             return True
         except Exception as e:
+            self.ultimo_erro = str(e)
             print(f"Erro ao conectar ao Mosquitto local: {e}")
+            if self.caixa_saida is not None:
+                # Continua tentando em segundo plano; até lá as mensagens vão para a caixa de saída
+                self.client.connect_async(self.broker, self.port, self.keepalive)
+                self.client.loop_start()
+                self._loop_ativo = True
             return False
 
+    def saude(self):
+        """
+        Estado da conexão para exibir nas páginas
+        
+        Returns:
+            dict: client_id, conectado, segundos conectado, desconexões,
+                último erro e os contadores de publicação
+        """
+        return {
+            "client_id": self.client_id,
+            "conectado": self.conectado,
+            "conectado_ha_s": round(time.time() - self.conectado_desde, 1) if self.conectado_desde else None,
+            "desconexoes": self.desconexoes,
+            "ultimo_erro": self.ultimo_erro,
+            **self.status_publicacao(),
+        }
+
     def disconnect(self):
         """Desconecta do broker"""
+        self._parar_thread_envio()
+        if self._thread_caixa is not None:
+            self._parar_caixa.set()
+            self._sinal_esvaziar.set()
+            self._thread_caixa.join(timeout=2.0)
+            self._thread_caixa = None
         self.client.loop_stop()
+        self._loop_ativo = False
         self.client.disconnect()
+        if self.caixa_saida is not None:
+            self.caixa_saida.fechar()
         print("Desconectado do Mosquitto")
 
     def publicar(self, topico, mensagem, reter=False, qos=1):
@@ -54,24 +213,259 @@ class MosquittoLocalClient:
         
         Args:
             topico (str): Tópico MQTT
-            mensagem (str/dict): Conteúdo da mensagem
+            mensagem (str/dict/bytes/codec_mqtt.Deteccoes): Conteúdo da mensagem;
+                Deteccoes vira o payload binário (use um tópico terminado em /bin)
             reter (bool): Se True, mensagem fica retida no broker
             qos (int): Qualidade de serviço (0, 1 ou 2)
         
         Returns:
             bool: True se publicado com sucesso
         """
+        if self.assincrono:
+            return self.enfileirar(topico, mensagem, reter, qos)
         try:
-            # Converte dicionário para JSON se necessário
-            if isinstance(mensagem, dict):
-                mensagem = json.dumps(mensagem, ensure_ascii=False)
-            
-            result = self.client.publish(topico, mensagem, qos=qos, retain=reter)
-            return result.rc == mqtt.MQTT_ERR_SUCCESS
+            payload = self._serializar(mensagem)
+            if self._deve_guardar(qos):
+                return self._guardar(topico, payload, qos, reter)
+            result = self.client.publish(topico, payload, qos=qos, retain=reter)
+            return self._aceita_pelo_paho(result, qos)
         except Exception as e:
             print(f"Erro ao publicar: {e}")
             return False
 
+    def _deve_guardar(self, qos):
+        # Enquanto houver mensagens na caixa, as novas também entram nela para manter a ordem
+        return (self.caixa_saida is not None and qos > 0
+                and (not self.client.is_connected() or self._caixa_pendente))
+
+    def _aceita_pelo_paho(self, info, qos):
+        # Com QoS > 0 o paho guarda a mensagem mesmo sem conexão (MQTT_ERR_NO_CONN)
+        # e a reenvia ao reconectar; a partir daí ela é dele, não da caixa de saída.
+        # Sem o loop de rede ninguém reconecta, e a mensagem ficaria parada na fila dele
+        return info.rc == mqtt.MQTT_ERR_SUCCESS or (
+            info.rc == mqtt.MQTT_ERR_NO_CONN and qos > 0 and self._loop_ativo)
+
+    def _guardar(self, topico, payload, qos, reter):
+        """Guarda a mensagem na caixa de saída; False se não há caixa ou é QoS 0"""
+        if self.caixa_saida is None or qos == 0:
+            return False
+        with self._lock_caixa:
+            self.caixa_saida.adicionar(topico, payload, qos, reter, self._eh_estado(topico, reter))
+            self._caixa_pendente = True
+        self.estatisticas["guardadas"] += 1
+        return True
+
+    def _esvaziar_caixa(self):
+        while not self._parar_caixa.is_set():
+            # Acorda ao reconectar ou, no máximo, a cada segundo
+            self._sinal_esvaziar.wait(timeout=1.0)
+            self._sinal_esvaziar.clear()
+            if not (self.client.is_connected() and self._caixa_pendente):
+                continue
+            self.estatisticas["compactadas"] += self.caixa_saida.compactar()
+            while self.client.is_connected() and not self._parar_caixa.is_set():
+                with self._lock_caixa:
+                    lote = self.caixa_saida.proximas()
+                    if not lote:
+                        self._caixa_pendente = False
+                        break
+                entregues = []
+                for id_, topico, payload, qos, reter in lote:
+                    if not self.client.is_connected():
+                        break
+                    info = self.client.publish(topico, payload, qos=qos, retain=reter)
+                    if not self._aceita_pelo_paho(info, qos):
+                        break
+                    entregues.append((id_, info))
+                    time.sleep(1.0 / self.taxa_esvaziamento)
+                # O que o paho aceitou sai da caixa mesmo sem PUBACK: se a conexão
+                # cair, é ele quem reenvia, e mantê-la aqui duplicaria a mensagem
+                self.caixa_saida.remover([id_ for id_, _ in entregues])
+                confirmadas = 0
+                for _, info in entregues:
+                    try:
+                        info.wait_for_publish(timeout=5.0)
+                    except (RuntimeError, ValueError):
+                        break
+                    if not info.is_published():
+                        break
+                    confirmadas += 1
+                self.estatisticas["reenviadas"] += confirmadas
+                if confirmadas < len(lote):
+                    break
+
+    def _serializar(self, mensagem):
+        # Dicionário vira JSON e Deteccoes vira o formato binário compacto
+        return codec_mqtt.serializar(mensagem)
+
+    def _eh_estado(self, topico, reter):
+        return reter or topico.startswith(self.topicos_estado)
+
+    def enfileirar(self, topico, mensagem, reter=False, qos=1, futuro=None):
+        """
+        Enfileira uma mensagem para a thread de envio, sem bloquear
+        
+        Não altere `mensagem` depois de enfileirar: a serialização acontece
+        na thread de envio. Com a fila cheia, a mensagem comum mais antiga é
+        descartada para dar lugar à nova.
+        
+        Returns:
+            bool: True (a mensagem sempre entra na fila)
+        """
+        with self._condicao:
+            if self._thread_envio is None:
+                self._iniciar_thread_envio()
+            self.estatisticas["enfileiradas"] += 1
+            if self._eh_estado(topico, reter):
+                anterior = self._estados.pop(topico, None)
+                futuros = [futuro] if futuro is not None else []
+                if anterior is not None:
+                    self.estatisticas["coalescidas"] += 1
+                    futuros = anterior[3] + futuros
+                self._estados[topico] = (mensagem, qos, reter, futuros)
+            else:
+                if len(self._fila) >= self.tamanho_fila:
+                    _, _, _, _, antigo = self._fila.popleft()
+                    self.estatisticas["descartadas"] += 1
+                    if antigo is not None:
+                        antigo.set_result(False)
+                self._fila.append((topico, mensagem, qos, reter, futuro))
+            self._condicao.notify()
+        return True
+
+    def publicar_async(self, topico, mensagem, reter=False, qos=1):
+        """
+        Enfileira a mensagem e retorna um Future com a confirmação de entrega
+        
+        O Future resolve com True quando o broker confirma (PUBACK/PUBCOMP,
+        ou o envio no socket com QoS 0), com `GUARDADA` se a mensagem foi
+        para a caixa de saída (o reenvio não altera mais o Future) e com
+        False se foi descartada ou recusada. Para fire-and-forget use
+        `publicar` no modo assíncrono ou `enfileirar`.
+        
+        Returns:
+            concurrent.futures.Future: Resultado da entrega (bool ou GUARDADA)
+        """
+        futuro = Future()
+        self.enfileirar(topico, mensagem, reter, qos, futuro)
+        return futuro
+
+    def publicar_lote(self, mensagens, reter=False, qos=1, prazo=5.0):
+        """
+        Publica várias mensagens de uma vez e espera todas as confirmações
+        
+        Todas entram na fila de saída antes da primeira espera, então são
+        enviadas em sequência sem aguardar o PUBACK de cada uma; depois a
+        espera é única, limitada a `prazo` segundos para o lote inteiro.
+        
+        Args:
+            mensagens (dict/list): {tópico: mensagem} ou lista de (tópico, mensagem)
+            reter (bool): Se True, mensagens ficam retidas no broker
+            qos (int): Qualidade de serviço (0, 1 ou 2)
+            prazo (float): Espera máxima pelas confirmações em segundos
+        
+        Returns:
+            dict: {tópico: {"entregue": bool, "guardada": bool, "latencia_ms": float/None}};
+                "guardada" indica que a mensagem está na caixa de saída aguardando
+                a reconexão; latência None se não houve confirmação dentro do prazo
+        """
+        if isinstance(mensagens, dict):
+            mensagens = mensagens.items()
+        inicio = time.perf_counter()
+        concluidas = {}
+        futuros = {}
+        for topico, mensagem in mensagens:
+            futuro = Future()
+            futuro.add_done_callback(lambda _, topico=topico: concluidas.setdefault(topico, time.perf_counter()))
+            futuros[topico] = futuro
+            self.enfileirar(topico, mensagem, reter, qos, futuro)
+        wait(futuros.values(), timeout=prazo)
+        
+        resultado = {}
+        for topico, futuro in futuros.items():
+            estado = futuro.result() if futuro.done() else False
+            entregue = estado is True
+            fim = concluidas.get(topico)
+            resultado[topico] = {
+                "entregue": entregue,
+                "guardada": estado == GUARDADA,
+                "latencia_ms": round((fim - inicio) * 1000, 1) if entregue and fim else None,
+            }
+        return resultado
+
+    def _iniciar_thread_envio(self):
+        self._parar_envio = False
+        self._thread_envio = threading.Thread(target=self._enviar, name="mqtt_envio", daemon=True)
+        self._thread_envio.start()
+
+    def _proxima(self):
+        # Estados primeiro: comandos dos buzzers passam na frente do fluxo de detecções
+        if self._estados:
+            topico, (mensagem, qos, reter, futuros) = self._estados.popitem(last=False)
+            return topico, mensagem, qos, reter, futuros
+        topico, mensagem, qos, reter, futuro = self._fila.popleft()
+        return topico, mensagem, qos, reter, [futuro] if futuro is not None else []
+
+    def _enviar(self):
+        while True:
+            with self._condicao:
+                while not (self._estados or self._fila or self._parar_envio):
+                    self._condicao.wait()
+                if not (self._estados or self._fila):
+                    return
+                topico, mensagem, qos, reter, futuros = self._proxima()
+            enviada_em = time.monotonic()
+            guardada = False
+            try:
+                payload = self._serializar(mensagem)
+                if self._deve_guardar(qos):
+                    guardada = self._guardar(topico, payload, qos, reter)
+                    info = None
+                else:
+                    info = self.client.publish(topico, payload, qos=qos, retain=reter)
+            except Exception as e:
+                print(f"Erro ao publicar: {e}")
+                self.estatisticas["erros"] += 1
+                info = None
+            if info is None or not self._aceita_pelo_paho(info, qos):
+                # Erro ou guardada na caixa de saída: a entrega não foi confirmada agora
+                if info is not None:
+                    self.estatisticas["erros"] += 1
+                for futuro in futuros:
+                    futuro.set_result(GUARDADA if guardada else False)
+                continue
+            self.estatisticas["enviadas"] += 1
+            if futuros:
+                with self._lock_pendentes:
+                    # Confirmações anteriores ao envio são de uma mensagem antiga com o mesmo mid
+                    confirmada_em = self._confirmados.pop(info.mid, None)
+                    if confirmada_em is None or confirmada_em < enviada_em:
+                        self._pendentes.setdefault(info.mid, []).extend(futuros)
+                        futuros = []
+                for futuro in futuros:
+                    futuro.set_result(True)
+
+    def _parar_thread_envio(self, timeout=2.0):
+        """Envia o que restar na fila (até `timeout`) e encerra a thread de envio"""
+        if self._thread_envio is None:
+            return
+        with self._condicao:
+            self._parar_envio = True
+            self._condicao.notify()
+        self._thread_envio.join(timeout=timeout)
+        self._thread_envio = None
+
+    def status_publicacao(self):
+        """Contadores da fila de saída (para métricas e resumos)"""
+        with self._condicao:
+            status = dict(self.estatisticas)
+            status["na_fila"] = len(self._fila) + len(self._estados)
+        if self.caixa_saida is not None:
+            status["na_caixa_saida"] = len(self.caixa_saida)
+        with self._lock_pendentes:
+            status["aguardando_confirmacao"] = len(self._pendentes)
+        return status
+
     def sobrescrever(self, topico, mensagem, qos=1):
         """
         Sobrescreve uma mensagem (com retain=True)
@@ -84,6 +478,105 @@ class MosquittoLocalClient:
         return self.publicar(topico, mensagem, reter=True, qos=qos)
 
 
+class PublicadorEstado:
+    def __init__(self, cliente, topico, janela=8, min_ligar=5, max_desligar=1,
+                 heartbeat=30.0, qos=1, reter=False):
+        """
+        Publica o estado de presença só nas transições, com histerese
+        
+        O estado liga quando há pelo menos `min_ligar` frames positivos entre
+        os últimos `janela` (ex.: pombo em 5 dos últimos 8 frames) e desliga
+        quando sobram no máximo `max_desligar` positivos. Entre transições,
+        o estado atual é republicado a cada `heartbeat` segundos.
+        
+        Args:
+            cliente (MosquittoLocalClient): Cliente conectado
+            topico (str): Tópico de estado (ex.: "ativos/EMAP")
+            janela (int): Quantidade de frames considerados
+            min_ligar (int): Positivos na janela para ligar
+            max_desligar (int): Positivos na janela abaixo ou igual ao qual desliga
+            heartbeat (float): Intervalo de republicação em segundos (0 desativa)
+            qos (int): Qualidade de serviço (0, 1 ou 2)
+            reter (bool): Se True, mensagem fica retida no broker
+        """
+        if not 0 <= max_desligar < min_ligar <= janela:
+            raise ValueError("É preciso 0 <= max_desligar < min_ligar <= janela")
+        self.cliente = cliente
+        self.topico = topico
+        self.min_ligar = min_ligar
+        self.max_desligar = max_desligar
+        self.heartbeat = heartbeat
+        self.qos = qos
+        self.reter = reter
+        self.janela = deque(maxlen=janela)
+        self.estado = None
+        self.ultima_publicacao = 0.0
+        self.publicacoes = 0
+
+    def _publicar(self):
+        self.ultima_publicacao = time.time()
+        self.publicacoes += 1
+        return self.cliente.publicar(self.topico, "True" if self.estado else "False",
+                                     reter=self.reter, qos=self.qos)
+
+    def atualizar(self, presente):
+        """
+        Registra a observação de um frame e publica se o estado mudou
+        
+        Args:
+            presente (bool): Se havia pombo no frame
+        
+        Returns:
+            bool: True se uma mensagem foi publicada
+        """
+        self.janela.append(bool(presente))
+        positivos = sum(self.janela)
+        
+        novo_estado = self.estado
+        if positivos >= self.min_ligar:
+            novo_estado = True
+        elif positivos <= self.max_desligar or self.estado is None:
+            novo_estado = False
+        
+        if novo_estado != self.estado:
+            self.estado = novo_estado
+            self._publicar()
+            return True
+        if self.heartbeat and time.time() - self.ultima_publicacao >= self.heartbeat:
+            self._publicar()
+            return True
+        return False
+
+
+# Clientes compartilhados pelo processo (ex.: todas as sessões e páginas do Streamlit)
+_clientes_compartilhados = {}
+_lock_compartilhados = threading.Lock()
+
+def cliente_compartilhado(nome="painel"):
+    """
+    Retorna o cliente compartilhado do processo, criando-o no primeiro uso
+    
+    A conexão é feita uma única vez, em segundo plano, com ID único por
+    processo (evita que o broker derrube outra instância com o mesmo ID) e
+    reconexão automática. Reruns do Streamlit e cliques em botões reutilizam
+    o mesmo cliente, então nada espera pela conexão.
+    
+    Args:
+        nome (str): Prefixo do ID; nomes diferentes geram clientes diferentes
+    
+    Returns:
+        MosquittoLocalClient: Cliente assíncrono já conectando
+    """
+    with _lock_compartilhados:
+        cliente = _clientes_compartilhados.get(nome)
+        if cliente is None:
+            cliente = MosquittoLocalClient(f"{nome}_{os.getpid()}_{uuid.uuid4().hex[:8]}", assincrono=True,
+                                           caixa_saida=f"mqtt_saida_{nome}.db")
+            cliente.connect(esperar=False)
+            _clientes_compartilhados[nome] = cliente
+        return cliente
+
+
 # Exemplo de uso com Mosquitto local
 if __name__ == "__main__":
     # Cria o cliente
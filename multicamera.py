@@ -0,0 +1,188 @@
+import argparse
+import time
+
+from banco_de_dados.criacao import definir_fonte_camera, listar_cameras_com_ativos
+from banco_de_dados.gravador import GravadorDeteccoes
+from camera import (CONFIDENCE_THRESHOLD, NMS_THRESHOLD, DISPLAY_WIDTH, DISPLAY_HEIGHT,
+                    get_model, warm_up, startup_report, detect_pigeons_in_batch)
+from mqtt import MosquittoLocalClient, PublicadorEstado
+from pipeline import LatestFrameGrabber
+from roi import RegionDetector
+
+
+def parse_source(fonte):
+    """Converte a fonte salva no banco em algo aceito por cv2.VideoCapture"""
+    fonte = str(fonte).strip()
+    return int(fonte) if fonte.isdigit() else fonte
+
+
+class MultiCameraRunner:
+    """
+    Executa a detecção em todas as câmeras cadastradas com uma única chamada
+    ao modelo por ciclo
+
+    A cada ciclo coleta o frame mais recente de cada câmera, recorta as
+    regiões de interesse cadastradas, monta um único lote com os recortes de
+    todas as câmeras, roda o YOLO uma vez e publica o resultado de cada
+    câmera no tópico `ativos/<nome>` de cada ativo associado a ela. Um ativo
+    com várias câmeras conta como ocupado se qualquer uma delas viu pombo, e
+    o estado só é publicado nas transições (PublicadorEstado).
+
+    Fontes RTSP/HTTP reconectam sozinhas com espera exponencial; uma câmera
+    fora do ar na inicialização entra no lote quando voltar.
+
+    Args:
+        cliente (MosquittoLocalClient): Cliente MQTT já conectado
+        cameras (list): Câmeras no formato de `listar_cameras_com_ativos`
+        conf_threshold (float): Limiar de confiança
+        frame_timeout (float): Espera máxima por um frame novo, somada entre todas as câmeras
+        tile_size (int): Lado dos ladrilhos para pombos pequenos (None desativa)
+        tile_overlap (float): Sobreposição entre ladrilhos
+        gravador (GravadorDeteccoes): Persiste as detecções no banco (opcional)
+    """
+
+    def __init__(self, cliente, cameras, conf_threshold=CONFIDENCE_THRESHOLD,
+                 frame_timeout=0.05, tile_size=None, tile_overlap=0.2, gravador=None):
+        self.cliente = cliente
+        self.gravador = gravador
+        self.cameras = cameras
+        self.conf_threshold = conf_threshold
+        self.frame_timeout = frame_timeout
+        self.grabbers = {}
+        self.publicadores = {
+            ativo: PublicadorEstado(cliente, f"ativos/{ativo}")
+            for camera in cameras for ativo in camera["ativos"]
+        }
+        self.regions = {
+            camera["id"]: RegionDetector(self.detect_batch, camera.get("rois"),
+                                         tile_size, tile_overlap, NMS_THRESHOLD)
+            for camera in cameras
+        }
+
+    def detect_batch(self, frames):
+        return detect_pigeons_in_batch(frames, get_model(), self.conf_threshold)
+
+    def start(self):
+        warm_up(get_model())
+        print(f"Inicialização (ms): {startup_report()}")
+        for camera in self.cameras:
+            if not camera["fonte"]:
+                print(f"Câmera {camera['nome']} sem fonte cadastrada, ignorando")
+                continue
+            grabber = LatestFrameGrabber(parse_source(camera["fonte"]),
+                                         DISPLAY_WIDTH, DISPLAY_HEIGHT)
+            if grabber.start():
+                self.grabbers[camera["id"]] = grabber
+            else:
+                print(f"Não foi possível abrir a câmera {camera['nome']}")
+        return len(self.grabbers) > 0
+
+    def collect_batch(self):
+        """Retorna (câmeras, frames, timestamps) com o frame mais recente de cada câmera ativa"""
+        batch_cameras, batch_frames, batch_times = [], [], []
+        # Um único prazo por ciclo: câmeras mortas não somam uma espera cada, e
+        # depois do primeiro frame as demais só entram se já tiverem um pronto
+        deadline = time.monotonic() + self.frame_timeout
+        for camera in self.cameras:
+            grabber = self.grabbers.get(camera["id"])
+            if grabber is None:
+                continue
+            timeout = 0 if batch_cameras else max(0.0, deadline - time.monotonic())
+            item = grabber.read(timeout=timeout)
+            if item is None:
+                continue
+            batch_cameras.append(camera)
+            batch_times.append(item[0])
+            batch_frames.append(item[1])
+        return batch_cameras, batch_frames, batch_times
+
+    def publish(self, batch_cameras, batch_detections):
+        presenca = {}
+        for camera in batch_cameras:
+            has_pigeon = len(batch_detections[camera["id"]]) > 0
+            for ativo in camera["ativos"]:
+                presenca[ativo] = presenca.get(ativo, False) or has_pigeon
+        for ativo, presente in presenca.items():
+            self.publicadores[ativo].atualizar(presente)
+
+    def step(self):
+        """Executa um ciclo: coleta, inferência em lote e publicação"""
+        batch_cameras, batch_frames, batch_times = self.collect_batch()
+        crops, spans = [], []
+        for camera, frame in zip(batch_cameras, batch_frames):
+            camera_crops, windows = self.regions[camera["id"]].prepare(frame)
+            spans.append((len(crops), len(crops) + len(camera_crops), windows))
+            crops.extend(camera_crops)
+
+        crop_detections = self.detect_batch(crops)
+        batch_detections = {}
+        for camera, (start, end, windows) in zip(batch_cameras, spans):
+            batch_detections[camera["id"]] = self.regions[camera["id"]].merge(
+                windows, crop_detections[start:end])
+        self.publish(batch_cameras, batch_detections)
+        if self.gravador is not None:
+            for camera, captured_at in zip(batch_cameras, batch_times):
+                detections = batch_detections[camera["id"]]
+                if len(detections) > 0:
+                    ativo = camera["ativos"][0] if camera["ativos"] else None
+                    self.gravador.registrar(camera["nome"], ativo, captured_at, detections)
+        return batch_detections
+
+    @property
+    def running(self):
+        return any(not grabber.ended for grabber in self.grabbers.values())
+
+    def run(self):
+        try:
+            while self.running:
+                if not self.step():
+                    time.sleep(0.01)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        for grabber in self.grabbers.values():
+            grabber.stop()
+        self.grabbers = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecção de pombos em todas as câmeras cadastradas")
+    parser.add_argument("--confianca", type=float, default=CONFIDENCE_THRESHOLD)
+    parser.add_argument("--ladrilho", type=int, default=None,
+                        help="Lado dos ladrilhos em pixels para pombos pequenos e distantes")
+    parser.add_argument("--sobreposicao", type=float, default=0.2)
+    parser.add_argument("--sem-gravacao", action="store_true",
+                        help="Não persiste as detecções na tabela deteccoes")
+    parser.add_argument("--definir-fonte", nargs=2, metavar=("CAMERA_ID", "FONTE"),
+                        help="Grava a fonte (índice, arquivo ou URL rtsp://, http://) da câmera e sai")
+    args = parser.parse_args()
+
+    if args.definir_fonte:
+        camera_id, fonte = args.definir_fonte
+        definir_fonte_camera(int(camera_id), fonte)
+        return
+
+    cliente = MosquittoLocalClient("detector_multicamera", assincrono=True,
+                                   caixa_saida="mqtt_saida_multicamera.db")
+    if not cliente.connect():
+        print("Mosquitto indisponível; os comandos ficam na caixa de saída até a conexão voltar.")
+
+    gravador = None if args.sem_gravacao else GravadorDeteccoes().iniciar()
+    runner = MultiCameraRunner(cliente, listar_cameras_com_ativos(), args.confianca,
+                               tile_size=args.ladrilho, tile_overlap=args.sobreposicao,
+                               gravador=gravador)
+    try:
+        if not runner.start():
+            exit("Nenhuma câmera pôde ser aberta. Cadastre a fonte com definir_fonte_camera.")
+        runner.run()
+    finally:
+        if gravador is not None:
+            gravador.parar()
+        cliente.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+GREEN = (0, 255, 0)
+RED = (0, 0, 255)
+WHITE = (255, 255, 255)
+YELLOW = (255, 255, 0)
+GRAY = (200, 200, 200)
+
+PANEL_X1, PANEL_Y1, PANEL_X2 = 10, 10, 250
+LINE_HEIGHT = 22
+
+
+@lru_cache(maxsize=256)
+def text_size(text, scale, thickness):
+    return cv2.getTextSize(text, FONT, scale, thickness)[0]
+
+
+class OverlayRenderer:
+    """
+    Desenha as detecções e o HUD sem alocar um frame novo a cada chamada
+
+    As partes estáticas (faixa de status, indicador circular e o painel com
+    os textos fixos) são desenhadas uma vez por resolução e depois apenas
+    copiadas para um buffer de saída pré-alocado. O buffer é reutilizado:
+    quem precisar guardar o resultado entre frames deve copiá-lo.
+
+    Args:
+        static_lines (list): Linhas fixas do painel como (texto, cor)
+    """
+
+    def __init__(self, static_lines=()):
+        self.static_lines = list(static_lines)
+        self._out = None
+        self._layers = {}
+
+    def _buffer(self, attr, shape):
+        buffer = getattr(self, attr)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+            setattr(self, attr, buffer)
+        return buffer
+
+    def _status_patch(self, width, has_pigeon):
+        if has_pigeon:
+            text, color, bg_color = "POMBO DETECTADO!", GREEN, (0, 150, 0)
+        else:
+            text, color, bg_color = "NENHUM POMBO", RED, (0, 0, 150)
+        size = text_size(text, 1.5, 3)
+        text_x = (width - size[0]) // 2
+        text_y = 80
+        x1, y1 = text_x - 20, text_y - size[1] - 20
+        x2, y2 = text_x + size[0] + 20, text_y + 10
+        patch = np.empty((y2 - y1 + 1, x2 - x1 + 1, 3), dtype=np.uint8)
+        patch[:] = bg_color
+        cv2.rectangle(patch, (0, 0), (x2 - x1, y2 - y1), color, 3)
+        cv2.putText(patch, text, (20, text_y - y1), FONT, 1.5, color, 3)
+        return (x1, y1), patch, None
+
+    def _circle_patch(self, width, has_pigeon):
+        x1, y1 = width - 82, 18
+        patch = np.zeros((65, 65, 3), dtype=np.uint8)
+        mask = np.zeros((65, 65), dtype=np.uint8)
+        center = (32, 32)
+        cv2.circle(patch, center, 30, GREEN if has_pigeon else RED, -1)
+        cv2.circle(patch, center, 30, WHITE, 2)
+        cv2.putText(patch, "✓" if has_pigeon else "✗", (width - 62 - x1, 60 - y1),
+                    FONT, 1.0, WHITE, 2)
+        cv2.circle(mask, center, 31, 255, -1)
+        return (x1, y1), patch, mask.astype(bool)
+
+    def _panel_patch(self, dynamic_count):
+        total = dynamic_count + len(self.static_lines)
+        y2 = total * LINE_HEIGHT + 20
+        patch = np.zeros((y2 - PANEL_Y1 + 1, PANEL_X2 - PANEL_X1 + 1, 3), dtype=np.uint8)
+        cv2.rectangle(patch, (0, 0), (PANEL_X2 - PANEL_X1, y2 - PANEL_Y1), WHITE, 1)
+        for i, (text, color) in enumerate(self.static_lines, start=dynamic_count):
+            if text:
+                cv2.putText(patch, text, (15 - PANEL_X1, 30 + i * LINE_HEIGHT - PANEL_Y1),
+                            FONT, 0.45, color, 1)
+        return (PANEL_X1, PANEL_Y1), patch, None
+
+    def _layer(self, key, build):
+        if key not in self._layers:
+            self._layers[key] = build()
+        return self._layers[key]
+
+    @staticmethod
+    def _paste(out, layer):
+        (x, y), patch, mask = layer
+        height, width = out.shape[:2]
+        # Recorta o patch para o caso de frames menores que o HUD
+        px1, py1 = max(0, -x), max(0, -y)
+        x1, y1 = max(0, x), max(0, y)
+        x2 = min(width, x + patch.shape[1])
+        y2 = min(height, y + patch.shape[0])
+        if x2 <= x1 or y2 <= y1:
+            return
+        source = patch[py1:py1 + y2 - y1, px1:px1 + x2 - x1]
+        if mask is None:
+            out[y1:y2, x1:x2] = source
+        else:
+            np.copyto(out[y1:y2, x1:x2], source, where=mask[py1:py1 + y2 - y1, px1:px1 + x2 - x1, None])
+
+    def render(self, frame, detections, info_lines=()):
+        """
+        Desenha detecções (Nx6 ou Nx7 com ID de trilha) e o HUD sobre o frame
+
+        Args:
+            frame (np.ndarray): Frame BGR
+            detections (np.ndarray): Detecções do frame
+            info_lines (list): Linhas dinâmicas do painel como (texto, cor)
+        """
+        out = self._buffer('_out', frame.shape)
+        np.copyto(out, frame)
+        width = frame.shape[1]
+        has_pigeon = len(detections) > 0
+
+        for detection in detections.tolist():
+            x1, y1, x2, y2 = (int(v) for v in detection[:4])
+            confidence = detection[4]
+            cv2.rectangle(out, (x1, y1), (x2, y2), GREEN, 2)
+            if len(detection) > 6:
+                text = f"Pombo #{int(detection[6])}: {confidence:.2f}"
+            else:
+                text = f"Pombo: {confidence:.2f}"
+            size = text_size(text, 0.6, 2)
+            cv2.rectangle(out, (x1, y1 - size[1] - 10), (x1 + size[0] + 5, y1), GREEN, -1)
+            cv2.putText(out, text, (x1 + 2, y1 - 5), FONT, 0.6, WHITE, 2)
+
+        self._paste(out, self._layer(('status', width, has_pigeon),
+                                     lambda: self._status_patch(width, has_pigeon)))
+        self._paste(out, self._layer(('panel', len(info_lines)),
+                                     lambda: self._panel_patch(len(info_lines))))
+        for i, (text, color) in enumerate(info_lines):
+            if text:
+                cv2.putText(out, text, (15, 30 + i * LINE_HEIGHT), FONT, 0.45, color, 1)
+        self._paste(out, self._layer(('circle', width, has_pigeon),
+                                     lambda: self._circle_patch(width, has_pigeon)))
+        return out
@@ -2,18 +2,38 @@ import streamlit as st
 import folium
 from streamlit_folium import st_folium
 from banco_de_dados.criacao import *
-from mqtt import MosquittoLocalClient
+from mqtt import cliente_compartilhado
 
-cliente = MosquittoLocalClient("python_client")
-if not cliente.connect():
-    exit("Não foi possível conectar ao Mosquitto local. Verifique se o broker está rodando.")
+# Um cliente por processo, compartilhado entre sessões e reruns (conecta em segundo plano)
+cliente = cliente_compartilhado("painel")
 st.set_page_config(layout="wide")
 st.title("Dashboard de Ação no Porto")
 
+saude_mqtt = cliente.saude()
+if saude_mqtt["conectado"]:
+    st.sidebar.success(f"MQTT conectado ({saude_mqtt['client_id']})")
+else:
+    st.sidebar.warning(f"MQTT desconectado, reconectando... {saude_mqtt['ultimo_erro'] or ''}")
+
 # Inicializa o estado da sessão para armazenar os markers ativados
 if 'markers_ativos' not in st.session_state:
     st.session_state.markers_ativos = set()
 
+def comandar_todos(locais, ligar):
+    """Envia o comando a todos os buzzers num único lote e guarda o resultado da entrega"""
+    resultado = cliente.publicar_lote(
+        {f"ativos/{local['nome']}": "True" if ligar else "False" for local in locais}, prazo=5.0)
+    latencias = [r["latencia_ms"] for r in resultado.values() if r["entregue"]]
+    st.session_state.ultimo_lote = {
+        "acao": "ativados" if ligar else "desativados",
+        "total": len(resultado),
+        "entregues": len(latencias),
+        "latencia_max_ms": max(latencias) if latencias else None,
+        "guardados": [topico.split("/", 1)[1] for topico, r in resultado.items() if r["guardada"]],
+        "falhas": [topico.split("/", 1)[1] for topico, r in resultado.items()
+                   if not (r["entregue"] or r["guardada"])],
+    }
+
 # Pontos no mapa
 locais = listar_buzzers_com_ativos()
 col_mapa, col_acao = st.columns([2, 1])
@@ -78,6 +98,19 @@ with col_acao:
     else:
         st.info("Clique em um ativo para liberar o pulso PEM")
         
+        # Resultado do último comando geral (sobrevive ao st.rerun)
+        lote = st.session_state.get("ultimo_lote")
+        if lote:
+            if lote["falhas"]:
+                st.error(f"PEMs {lote['acao']}: {lote['entregues']}/{lote['total']} confirmados. "
+                         f"Sem confirmação: {', '.join(lote['falhas'])}")
+            if lote["guardados"]:
+                st.warning(f"PEMs {lote['acao']}: {len(lote['guardados'])}/{lote['total']} "
+                           f"enfileirados para reenvio quando o MQTT reconectar: {', '.join(lote['guardados'])}")
+            if not (lote["falhas"] or lote["guardados"]):
+                st.success(f"PEMs {lote['acao']}: {lote['entregues']}/{lote['total']} confirmados "
+                           f"(máx. {lote['latencia_max_ms']} ms)")
+        
         # Container para os botões de ação geral
         col_geral1, col_geral2 = st.columns(2)
         
@@ -86,9 +119,7 @@ with col_acao:
                         key=f"btn_ativar_geral"):
                 # Ativa todos os markers
                 st.session_state.markers_ativos = {f"{p['lat']}_{p['lon']}" for p in locais}
-                for local in locais:
-                    cliente.publicar(f"ativos/{local['nome']}", "True")
-                st.success("PEM ativado em todas as áreas!")
+                comandar_todos(locais, ligar=True)
                 st.rerun()
         
         with col_geral2:
@@ -96,7 +127,5 @@ with col_acao:
                         key=f"btn_desligar_geral"):
                 # Limpa todos os markers ativos
                 st.session_state.markers_ativos = set()
-                for local in locais:
-                    cliente.publicar(f"ativos/{local['nome']}", "False")
-                st.success("Todos os PEMs foram desativados!")
+                comandar_todos(locais, ligar=False)
                 st.rerun()
\ No newline at end of file
@@ -0,0 +1,252 @@
+import os
+import threading
+import queue
+import time
+
+import cv2
+
+NETWORK_SCHEMES = ('rtsp', 'rtsps', 'rtmp', 'http', 'https', 'udp', 'tcp')
+# RTSP por TCP e sem buffer de demux no FFmpeg; pode ser sobrescrito pela variável de ambiente
+FFMPEG_LOW_LATENCY_OPTIONS = 'rtsp_transport;tcp|fflags;nobuffer|flags;low_delay'
+# Usado para cadenciar arquivos sem CAP_PROP_FPS válido
+DEFAULT_FILE_FPS = 30.0
+
+
+def is_network_source(source):
+    return isinstance(source, str) and source.split('://', 1)[0].lower() in NETWORK_SCHEMES
+
+
+def is_file_source(source):
+    # Dispositivos como /dev/video0 não são arquivos regulares e já entregam em tempo real
+    return isinstance(source, str) and not is_network_source(source) and os.path.isfile(source)
+
+
+def open_capture(source, width=None, height=None):
+    """
+    Abre a fonte de vídeo com as opções de baixa latência adequadas
+
+    Returns:
+        cv2.VideoCapture/None: Captura aberta ou None se a fonte não abriu
+    """
+    if is_network_source(source):
+        os.environ.setdefault('OPENCV_FFMPEG_CAPTURE_OPTIONS', FFMPEG_LOW_LATENCY_OPTIONS)
+        cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    else:
+        cap = cv2.VideoCapture(source)
+        if width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if not cap.isOpened():
+        cap.release()
+        return None
+    return cap
+
+
+class DropOldestQueue:
+    """Fila pequena que descarta o item mais antigo quando está cheia"""
+
+    def __init__(self, maxsize=1):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, item):
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Retorna o próximo item ou None se nada chegar dentro do timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LatestFrameGrabber:
+    """
+    Thread de captura que mantém apenas o frame mais recente da câmera
+
+    A thread lê continuamente, esvaziando o buffer do decodificador, e só o
+    frame mais novo fica disponível. Com `reconnect`, uma falha de leitura
+    fecha a captura e tenta reabrir com espera exponencial, sem encerrar a
+    thread nem quem consome os frames (o modelo continua carregado). O padrão
+    é reconectar apenas fontes de rede (RTSP/HTTP); com um arquivo local e
+    `reconnect=True` o vídeo recomeça ao terminar, o que serve para simular
+    uma câmera IP que cai.
+
+    Arquivos são decodificados muito mais rápido que o tempo real; com
+    `pace` a leitura segue o CAP_PROP_FPS do arquivo, como faria a câmera,
+    em vez de descartar quase todos os frames e chegar ao fim em instantes.
+
+    Args:
+        source (int/str): Índice da webcam ou caminho/URL aceito pelo OpenCV
+        width (int): Largura desejada da captura (opcional)
+        height (int): Altura desejada da captura (opcional)
+        timer (StageTimer): Recebe o tempo de cada leitura como "captura" (opcional)
+        reconnect (bool): Reabre a fonte após falhas (None = só fontes de rede)
+        backoff_initial (float): Primeira espera antes de reabrir (s)
+        backoff_max (float): Espera máxima entre tentativas (s)
+        pace (bool): Entrega os frames no ritmo do FPS da fonte (None = só arquivos)
+    """
+
+    def __init__(self, source, width=None, height=None, timer=None, reconnect=None,
+                 backoff_initial=0.5, backoff_max=30.0, pace=None):
+        self.source = source
+        self.timer = timer
+        self.width = width
+        self.height = height
+        self.reconnect = is_network_source(source) if reconnect is None else reconnect
+        self.pace = is_file_source(source) if pace is None else pace
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.frames = DropOldestQueue(maxsize=1)
+        self.cap = None
+        self.ended = False
+        self.connected = False
+        self.reconnections = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Abre a câmera e inicia a thread de captura
+
+        Returns:
+            bool: False se a fonte não abriu e não há reconexão; com reconexão
+            a thread continua tentando em segundo plano
+        """
+        self.cap = open_capture(self.source, self.width, self.height)
+        if self.cap is None:
+            if not self.reconnect:
+                return False
+            print(f"Fonte {self.source} indisponível, tentando reconectar em segundo plano")
+        self.connected = self.cap is not None
+
+        self._thread = threading.Thread(target=self._run, name="captura", daemon=True)
+        self._thread.start()
+        return True
+
+    def _frame_interval(self):
+        if not self.pace:
+            return 0.0
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        return 1.0 / (fps if 0 < fps < 1000 else DEFAULT_FILE_FPS)
+
+    def _run(self):
+        delay = self.backoff_initial
+        interval = self._frame_interval() if self.cap is not None else 0.0
+        next_frame = time.monotonic()
+        while not self._stop.is_set():
+            if self.cap is None:
+                self.cap = open_capture(self.source, self.width, self.height)
+                if self.cap is None:
+                    self._stop.wait(delay)
+                    delay = min(delay * 2, self.backoff_max)
+                    continue
+                self.reconnections += 1
+                interval = self._frame_interval()
+                next_frame = time.monotonic()
+
+            if interval:
+                wait = next_frame - time.monotonic()
+                if wait > 0 and self._stop.wait(wait):
+                    break
+                # Se o consumo atrasou, não tenta recuperar lendo em rajada
+                next_frame = max(next_frame, time.monotonic() - interval) + interval
+
+            started = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                self.cap.release()
+                self.cap = None
+                self.connected = False
+                if not self.reconnect:
+                    break
+                print(f"Falha de leitura em {self.source}; reconectando em {delay:.1f}s")
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.backoff_max)
+                continue
+
+            self.connected = True
+            delay = self.backoff_initial
+            if self.timer is not None:
+                self.timer.record('captura', (time.perf_counter() - started) * 1000)
+            self.frames.put((time.time(), frame))
+        self.ended = True
+        self.connected = False
+        if self.cap is not None:
+            self.cap.release()
+
+    def read(self, timeout=None):
+        """Retorna (timestamp, frame) do frame mais recente ainda não consumido"""
+        return self.frames.get(timeout=timeout)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+
+class DetectionPipeline:
+    """
+    Pipeline captura -> inferência -> renderização
+
+    A captura e a inferência rodam em threads próprias ligadas por filas que
+    descartam o item mais antigo; a renderização fica com quem chama `get`,
+    normalmente a thread principal (cv2.imshow e Streamlit exigem isso).
+    Assim a latência fica limitada a um tempo de inferência, e não ao
+    tamanho do acúmulo de frames.
+
+    Args:
+        grabber (LatestFrameGrabber): Fonte de frames
+        detect_fn (callable): Função frame -> detecções
+        maxsize (int): Tamanho da fila entre inferência e renderização
+    """
+
+    def __init__(self, grabber, detect_fn, maxsize=1):
+        self.grabber = grabber
+        self.detect_fn = detect_fn
+        self.results = DropOldestQueue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not self.grabber.start():
+            return False
+        self._thread = threading.Thread(target=self._run, name="inferencia", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            item = self.grabber.read(timeout=0.1)
+            if item is None:
+                if self.grabber.ended:
+                    break
+                continue
+            captured_at, frame = item
+            detections = self.detect_fn(frame)
+            self.results.put((frame, detections, captured_at))
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def get(self, timeout=0.1):
+        """Retorna (frame, detecções, timestamp de captura) ou None"""
+        return self.results.get(timeout=timeout)
+
+    def stop(self):
+        self._stop.set()
+        self.grabber.stop()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
@@ -0,0 +1,137 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+BOUNDARY = "frame"
+
+
+class PreviewEncoder:
+    """
+    Gera a prévia comprimida enviada aos operadores
+
+    Reduz o frame, codifica em JPEG e limita a taxa de prévias de forma
+    independente da taxa de detecção.
+
+    Args:
+        max_width (int): Largura máxima da prévia em pixels
+        quality (int): Qualidade JPEG (1-100)
+        max_fps (float): Prévias por segundo no máximo
+    """
+
+    def __init__(self, max_width=640, quality=70, max_fps=10.0):
+        self.max_width = max_width
+        self.quality = quality
+        self.max_fps = max_fps
+        self._last = 0.0
+
+    def due(self):
+        """True se já passou o intervalo mínimo desde a última prévia"""
+        return time.time() - self._last >= 1.0 / self.max_fps
+
+    def encode(self, frame, force=False):
+        """
+        Retorna os bytes JPEG da prévia ou None se ainda não é hora de enviar
+
+        Args:
+            frame (np.ndarray): Frame BGR (já com as detecções desenhadas)
+            force (bool): Ignora o limite de taxa
+        """
+        if not force and not self.due():
+            return None
+        self._last = time.time()
+        height, width = frame.shape[:2]
+        if width > self.max_width:
+            frame = cv2.resize(frame, (self.max_width, int(height * self.max_width / width)),
+                               interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)])
+        return jpeg.tobytes() if ok else None
+
+
+class MJPEGServer:
+    """
+    Servidor HTTP que transmite a última prévia como MJPEG
+
+    Qualquer número de operadores pode abrir `http://<host>:<porta>/` no
+    navegador sem rodar um loop de inferência próprio; `/snapshot.jpg`
+    devolve apenas o quadro mais recente.
+
+    Args:
+        host (str): Endereço de escuta
+        port (int): Porta HTTP
+    """
+
+    def __init__(self, host="0.0.0.0", port=8090):
+        self.host = host
+        self.port = port
+        self._jpeg = None
+        self._seq = 0
+        self._condition = threading.Condition()
+        self._server = None
+        self._thread = None
+
+    def publish(self, jpeg):
+        """Disponibiliza um novo quadro JPEG para todos os clientes"""
+        with self._condition:
+            self._jpeg = jpeg
+            self._seq += 1
+            self._condition.notify_all()
+
+    def wait_frame(self, last_seq, timeout=5.0):
+        """Espera um quadro mais novo que `last_seq`; retorna (seq, jpeg)"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq != last_seq, timeout=timeout)
+            return self._seq, self._jpeg
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.startswith("/snapshot"):
+                    _, jpeg = server.wait_frame(-1, timeout=0)
+                    if jpeg is None:
+                        self.send_error(503, "Sem quadros ainda")
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/jpeg")
+                    self.send_header("Content-Length", str(len(jpeg)))
+                    self.end_headers()
+                    self.wfile.write(jpeg)
+                    return
+
+                self.send_response(200)
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.end_headers()
+                seq = 0
+                try:
+                    while True:
+                        new_seq, jpeg = server.wait_frame(seq)
+                        if new_seq == seq or jpeg is None:
+                            continue
+                        seq = new_seq
+                        self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                         f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mjpeg", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+
+
+def polygon_bounds(polygon, frame_shape):
+    """Retângulo (x1, y1, x2, y2) que envolve o polígono, limitado ao frame"""
+    height, width = frame_shape[:2]
+    points = np.asarray(polygon, dtype=np.int32)
+    x1, y1 = np.clip(points.min(axis=0), 0, [width, height])
+    x2, y2 = np.clip(points.max(axis=0) + 1, 0, [width, height])
+    return int(x1), int(y1), int(x2), int(y2)
+
+
+def tile_windows(x1, y1, x2, y2, tile_size, overlap=0.2):
+    """Divide o retângulo em janelas de `tile_size` pixels com sobreposição"""
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(start, end):
+        if end - start <= tile_size:
+            return [start]
+        positions = list(range(start, end - tile_size, step))
+        positions.append(end - tile_size)
+        return positions
+
+    return [(x, y, min(x + tile_size, x2), min(y + tile_size, y2))
+            for y in starts(y1, y2) for x in starts(x1, x2)]
+
+
+def merge_detections(detections, iou_threshold):
+    """NMS entre janelas para remover pombos detectados em mais de um recorte"""
+    if len(detections) < 2:
+        return detections
+    boxes = detections[:, :4].copy()
+    boxes[:, 2:] -= boxes[:, :2]
+    keep = cv2.dnn.NMSBoxes(boxes.tolist(), detections[:, 4].tolist(), 0.0, iou_threshold)
+    return detections[np.asarray(keep, dtype=np.int64).reshape(-1)]
+
+
+class RegionDetector:
+    """
+    Inferência restrita às regiões de interesse da câmera, com ladrilhamento opcional
+
+    O modelo só vê os retângulos que envolvem os polígonos cadastrados (ou
+    ladrilhos deles, para pombos pequenos e distantes). As caixas voltam para
+    coordenadas do frame completo e só ficam as que têm centro dentro de
+    algum polígono.
+
+    Args:
+        detect_batch_fn (callable): Função lista de recortes -> lista de detecções Nx6
+        rois (list): Polígonos [[x, y], ...]; vazio usa o frame inteiro
+        tile_size (int): Lado dos ladrilhos em pixels (None desativa)
+        overlap (float): Sobreposição entre ladrilhos vizinhos
+        iou_threshold (float): IoU do NMS entre recortes
+    """
+
+    def __init__(self, detect_batch_fn, rois=None, tile_size=None, overlap=0.2, iou_threshold=0.45):
+        self.detect_batch_fn = detect_batch_fn
+        self.rois = [np.asarray(polygon, dtype=np.float32) for polygon in (rois or [])]
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.iou_threshold = iou_threshold
+        self._windows_cache = {}
+
+    def windows(self, frame_shape):
+        key = frame_shape[:2]
+        if key not in self._windows_cache:
+            if self.rois:
+                regions = [polygon_bounds(polygon, frame_shape) for polygon in self.rois]
+            else:
+                regions = [(0, 0, frame_shape[1], frame_shape[0])]
+            windows = []
+            for region in regions:
+                if self.tile_size:
+                    windows.extend(tile_windows(*region, self.tile_size, self.overlap))
+                else:
+                    windows.append(region)
+            self._windows_cache[key] = [w for w in windows if w[2] > w[0] and w[3] > w[1]]
+        return self._windows_cache[key]
+
+    def prepare(self, frame):
+        """Retorna (recortes, janelas) a serem enviados ao modelo"""
+        windows = self.windows(frame.shape)
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+        return crops, windows
+
+    def _inside_rois(self, detections):
+        if not self.rois or len(detections) == 0:
+            return detections
+        centers = (detections[:, :2] + detections[:, 2:4]) / 2
+        inside = np.zeros(len(detections), dtype=bool)
+        for polygon in self.rois:
+            inside |= np.array([cv2.pointPolygonTest(polygon, (float(cx), float(cy)), False) >= 0
+                                for cx, cy in centers])
+        return detections[inside]
+
+    def merge(self, windows, crop_detections):
+        """Leva as detecções de cada recorte de volta ao frame completo"""
+        mapped = []
+        for (x1, y1, _, _), detections in zip(windows, crop_detections):
+            if len(detections) == 0:
+                continue
+            detections = detections.copy()
+            detections[:, [0, 2]] += x1
+            detections[:, [1, 3]] += y1
+            mapped.append(detections)
+        if not mapped:
+            return np.empty((0, 6), dtype=np.float32)
+        detections = np.concatenate(mapped)
+        if len(windows) > 1:
+            detections = merge_detections(detections, self.iou_threshold)
+        return self._inside_rois(detections)
+
+    def __call__(self, frame):
+        crops, windows = self.prepare(frame)
+        return self.merge(windows, self.detect_batch_fn(crops))
@@ -0,0 +1,258 @@
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU entre todas as caixas de `boxes_a` (Nx4) e `boxes_b` (Mx4)"""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    a = boxes_a[:, None, :4]
+    b = boxes_b[None, :, :4]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+def center_affinity(tracks, boxes, motion_gate):
+    """
+    Afinidade por distância entre centros: 1 no centro previsto, 0 na borda do portão
+
+    O raio do portão é `motion_gate` vezes o lado maior da trilha por frame
+    desde a última associação, de modo que um pombo em voo, ainda sem
+    velocidade estimada, continua dentro do alcance depois de N frames.
+    """
+    if not tracks or len(boxes) == 0:
+        return np.zeros((len(tracks), len(boxes)), dtype=np.float32)
+    track_boxes = np.array([track.bbox for track in tracks], dtype=np.float32)
+    track_centers = (track_boxes[:, :2] + track_boxes[:, 2:4]) / 2
+    centers = (boxes[:, :2] + boxes[:, 2:4]) / 2
+    distances = np.linalg.norm(track_centers[:, None, :] - centers[None, :, :], axis=2)
+    gates = np.array([motion_gate * max(track.state[2], track.state[3]) * max(1, track.time_since_update)
+                      for track in tracks], dtype=np.float32)
+    return 1 - distances / gates[:, None]
+
+
+def greedy_match(iou, min_iou):
+    """Associa pares (linha, coluna) em ordem decrescente de IoU"""
+    matches = []
+    if iou.size == 0:
+        return matches, list(range(iou.shape[0])), list(range(iou.shape[1]))
+    iou = iou.copy()
+    while True:
+        row, col = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[row, col] < min_iou:
+            break
+        matches.append((row, col))
+        iou[row, :] = -1
+        iou[:, col] = -1
+    matched_rows = {row for row, _ in matches}
+    matched_cols = {col for _, col in matches}
+    unmatched_rows = [r for r in range(iou.shape[0]) if r not in matched_rows]
+    unmatched_cols = [c for c in range(iou.shape[1]) if c not in matched_cols]
+    return matches, unmatched_rows, unmatched_cols
+
+
+class Track:
+    """
+    Pombo rastreado com filtro de Kalman de velocidade constante
+
+    Estado: [cx, cy, w, h, vx, vy, vw, vh]
+    """
+
+    _F = np.eye(8, dtype=np.float32)
+    _F[:4, 4:] = np.eye(4)
+    _H = np.eye(4, 8, dtype=np.float32)
+    _Q = np.diag([1, 1, 1, 1, 0.1, 0.1, 0.1, 0.1]).astype(np.float32)
+    _R = np.diag([4, 4, 10, 10]).astype(np.float32)
+
+    def __init__(self, track_id, detection):
+        self.track_id = track_id
+        self.state = np.zeros(8, dtype=np.float32)
+        self.state[:4] = self._to_cxcywh(detection[:4])
+        self.covariance = np.diag([10, 10, 10, 10, 100, 100, 100, 100]).astype(np.float32)
+        self.confidence = float(detection[4])
+        self.class_id = float(detection[5])
+        self.hits = 1
+        self.misses = 0
+        # Frames desde a última associação (previsões feitas sem medição)
+        self.time_since_update = 0
+
+    @staticmethod
+    def _to_cxcywh(box):
+        x1, y1, x2, y2 = box
+        return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], dtype=np.float32)
+
+    @property
+    def bbox(self):
+        cx, cy, w, h = self.state[:4]
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], dtype=np.float32)
+
+    def predict(self, confidence_decay):
+        self.state = self._F @ self.state
+        self.state[2:4] = np.maximum(self.state[2:4], 1.0)
+        self.covariance = self._F @ self.covariance @ self._F.T + self._Q
+        self.confidence *= confidence_decay
+        self.time_since_update += 1
+
+    def update(self, detection):
+        measurement = self._to_cxcywh(detection[:4])
+        if self.hits == 1:
+            # Primeira reassociação: a velocidade sai do deslocamento desde a criação,
+            # em vez de esperar o filtro convergir a partir de zero
+            frames = max(1, self.time_since_update)
+            self.state[4:] = (measurement - self.state[:4]) / frames
+            self.state[:4] = measurement
+            self.covariance = np.diag([4, 4, 10, 10, 10, 10, 10, 10]).astype(np.float32)
+            self._matched(detection)
+            return
+        innovation = measurement - self._H @ self.state
+        s = self._H @ self.covariance @ self._H.T + self._R
+        gain = self.covariance @ self._H.T @ np.linalg.inv(s)
+        self.state = self.state + gain @ innovation
+        self.covariance = (np.eye(8, dtype=np.float32) - gain @ self._H) @ self.covariance
+        self._matched(detection)
+
+    def _matched(self, detection):
+        self.confidence = float(detection[4])
+        self.hits += 1
+        self.misses = 0
+        self.time_since_update = 0
+
+
+class IoUTracker:
+    """
+    Rastreador multiobjeto leve no estilo ByteTrack
+
+    Detecções de alta confiança são associadas primeiro; as de baixa
+    confiança só servem para manter trilhas já existentes. Entre execuções
+    do detector, `predict` propaga as caixas pelo filtro de Kalman.
+
+    O que sobra da associação por IoU ainda pode casar pela distância entre
+    centros (ver `center_affinity`): com o detector rodando a cada N frames,
+    uma trilha nova ainda não tem velocidade e um pombo em voo já saiu da
+    caixa prevista. Detecções de alta confiança sempre aparecem na saída do
+    frame em que foram detectadas, mesmo em trilhas ainda não confirmadas.
+
+    Args:
+        high_threshold (float): Confiança mínima para abrir novas trilhas
+        min_iou (float): IoU mínimo para associar detecção e trilha
+        max_misses (int): Execuções do detector sem associação antes de descartar
+        min_hits (int): Associações necessárias para confirmar uma trilha
+        confidence_decay (float): Fator aplicado à confiança a cada frame previsto
+        motion_gate (float): Deslocamento máximo por frame, em lados da caixa, na
+            associação por distância
+    """
+
+    def __init__(self, high_threshold=0.3, min_iou=0.3, max_misses=3,
+                 min_hits=2, confidence_decay=0.95, motion_gate=0.5):
+        self.high_threshold = high_threshold
+        self.min_iou = min_iou
+        self.motion_gate = motion_gate
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+        self.confidence_decay = confidence_decay
+        self.tracks = []
+        self.confirmed_ids = set()
+        self._next_id = 1
+
+    @property
+    def distinct_count(self):
+        """Quantidade de pombos distintos confirmados desde o início"""
+        return len(self.confirmed_ids)
+
+    @property
+    def mean_confidence(self):
+        if not self.tracks:
+            return 1.0
+        return float(np.mean([track.confidence for track in self.tracks]))
+
+    def predict(self):
+        for track in self.tracks:
+            track.predict(self.confidence_decay)
+
+    def _associate(self, tracks, detections):
+        track_boxes = np.array([track.bbox for track in tracks], dtype=np.float32).reshape(-1, 4)
+        matches, unmatched_tracks, unmatched_dets = greedy_match(
+            iou_matrix(track_boxes, detections), self.min_iou)
+        if unmatched_tracks and unmatched_dets:
+            leftover_tracks = [tracks[i] for i in unmatched_tracks]
+            affinity = center_affinity(leftover_tracks, detections[unmatched_dets], self.motion_gate)
+            center_matches, still_tracks, still_dets = greedy_match(affinity, 0.0)
+            matches += [(unmatched_tracks[t], unmatched_dets[d]) for t, d in center_matches]
+            unmatched_tracks = [unmatched_tracks[t] for t in still_tracks]
+            unmatched_dets = [unmatched_dets[d] for d in still_dets]
+        for track_index, det_index in matches:
+            tracks[track_index].update(detections[det_index])
+        return [tracks[i] for i in unmatched_tracks], unmatched_dets
+
+    def update(self, detections):
+        """Associa as detecções (Nx6) às trilhas, já previstas para este frame"""
+        high = detections[detections[:, 4] >= self.high_threshold]
+        low = detections[detections[:, 4] < self.high_threshold]
+
+        remaining, unmatched_high = self._associate(self.tracks, high)
+        remaining, _ = self._associate(remaining, low)
+
+        for track in remaining:
+            track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+
+        for det_index in unmatched_high:
+            self.tracks.append(Track(self._next_id, high[det_index]))
+            self._next_id += 1
+
+        for track in self.tracks:
+            if track.hits >= self.min_hits:
+                self.confirmed_ids.add(track.track_id)
+
+    def _visible(self, track):
+        # Trilhas não confirmadas aparecem só no frame em que tiveram detecção de alta confiança
+        return track.hits >= self.min_hits or (
+            track.time_since_update == 0 and track.confidence >= self.high_threshold)
+
+    def output(self):
+        """
+        Trilhas como array Nx7: [x1, y1, x2, y2, conf, cls, id]
+
+        Inclui as confirmadas e, no frame do detector, as ainda não
+        confirmadas com detecção de alta confiança, para a presença não
+        depender da confirmação.
+        """
+        rows = [np.concatenate([track.bbox, [track.confidence, track.class_id, track.track_id]])
+                for track in self.tracks if self._visible(track)]
+        if not rows:
+            return np.empty((0, 7), dtype=np.float32)
+        return np.array(rows, dtype=np.float32)
+
+
+class TrackingDetector:
+    """
+    Roda o detector só a cada N frames (ou quando a confiança das trilhas
+    cai) e usa o rastreador para propagar as caixas nos frames intermediários
+
+    Args:
+        detect_fn (callable): Função frame -> detecções Nx6
+        tracker (IoUTracker): Rastreador
+        detect_every (int): Intervalo, em frames, entre execuções do detector
+        min_confidence (float): Confiança média abaixo da qual o detector roda antes
+    """
+
+    def __init__(self, detect_fn, tracker=None, detect_every=5, min_confidence=0.2):
+        self.detect_fn = detect_fn
+        self.tracker = tracker or IoUTracker()
+        self.detect_every = detect_every
+        self.min_confidence = min_confidence
+        self._frames_since_detection = None
+
+    def __call__(self, frame):
+        self.tracker.predict()
+        if (self._frames_since_detection is None
+                or self._frames_since_detection + 1 >= self.detect_every
+                or self.tracker.mean_confidence < self.min_confidence):
+            self.tracker.update(self.detect_fn(frame))
+            self._frames_since_detection = 0
+        else:
+            self._frames_since_detection += 1
+        return self.tracker.output()